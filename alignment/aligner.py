@@ -0,0 +1,275 @@
+"""
+Align camera frames against a fixed template image.
+
+The template's keypoints and descriptors are computed once per template and
+detector setting and kept in an .npz cache, so aligning a frame only costs
+the frame's own detection, the matching and RANSAC.
+"""
+
+import hashlib
+import os
+from time import perf_counter
+
+import cv2 as cv
+import numpy as np
+
+# detector name: (factory, descriptor norm)
+DETECTORS = {"sift": (cv.SIFT_create, cv.NORM_L2),
+             "orb": (cv.ORB_create, cv.NORM_HAMMING)}
+
+FLANN_INDEX_KDTREE = 1
+
+
+def keypoints_to_array(keypoints):
+    """ (n, 7) float array of x, y, size, angle, response, octave, class_id """
+    return np.array([(*kp.pt, kp.size, kp.angle, kp.response, kp.octave, kp.class_id)
+                     for kp in keypoints], dtype=np.float64).reshape(-1, 7)
+
+
+def array_to_keypoints(array):
+    return [cv.KeyPoint(x, y, size, angle, response, int(octave), int(class_id))
+            for x, y, size, angle, response, octave, class_id in array]
+
+
+def read_gray(image):
+    """ A grayscale image from a file name, or the array itself """
+    if isinstance(image, (str, os.PathLike)):
+        img = cv.imread(os.fspath(image), cv.IMREAD_GRAYSCALE)
+        if img is None:
+            raise FileNotFoundError(image)
+        return img
+    return image
+
+
+class Alignment:
+    """ Result of aligning one frame, homography maps template to frame pixels """
+
+    def __init__(self, homography, good, inliers, timings, keypoints=None, matches=None, mask=None):
+        self.homography = homography
+        self.good = good
+        self.inliers = inliers
+        self.timings = timings
+        # frame keypoints, good matches and RANSAC inlier mask, for drawing
+        self.keypoints = keypoints
+        self.matches = matches
+        self.mask = mask
+
+    @property
+    def success(self):
+        return self.homography is not None
+
+    def as_dict(self):
+        return {"homography": None if self.homography is None else self.homography.tolist(),
+                "good": self.good,
+                "inliers": self.inliers,
+                **{f"{stage}_time": t for stage, t in self.timings.items()}}
+
+
+class TemplateAligner:
+    """
+    Find a template in camera frames with feature matching and RANSAC.
+
+    detector: "sift" or "orb", params are passed to its factory.
+    cache_dir: directory for the template feature cache, None keeps the
+        features in memory only. Entries are keyed by the template pixels,
+        the detector, its parameters and the OpenCV version.
+    ratio: Lowe's ratio test threshold for the two nearest matches.
+    """
+
+    def __init__(self, template, detector="sift", params=None, cache_dir=None,
+                 ratio=0.7, min_matches=10, ransac_threshold=5.0):
+        if detector not in DETECTORS:
+            raise ValueError(f"unknown detector {detector!r}, choose from {', '.join(DETECTORS)}")
+        self.template = read_gray(template)
+        self.detector_name = detector
+        self.params = dict(params or {})
+        self.cache_dir = cache_dir
+        self.ratio = ratio
+        self.min_matches = min_matches
+        self.ransac_threshold = ransac_threshold
+
+        factory, self.norm = DETECTORS[detector]
+        self.detector = factory(**self.params)
+        self.keypoints, self.descriptors = self._template_features()
+        self.matcher = self._create_matcher()
+        self.matcher.add([self.descriptors])
+        self.matcher.train()
+
+    def cache_key(self):
+        digest = hashlib.sha1()
+        digest.update(repr((self.template.shape, self.template.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(self.template).tobytes())
+        digest.update(repr((self.detector_name, sorted(self.params.items()), cv.__version__)).encode())
+        return digest.hexdigest()
+
+    def cache_path(self):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{self.detector_name}_{self.cache_key()}.npz")
+
+    def _template_features(self):
+        path = self.cache_path()
+        if path is not None and os.path.exists(path):
+            with np.load(path) as data:
+                return array_to_keypoints(data["keypoints"]), data["descriptors"]
+        keypoints, descriptors = self.detect(self.template)
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write then rename, so a concurrent reader never sees half a file
+            tmp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, keypoints=keypoints_to_array(keypoints), descriptors=descriptors)
+            os.replace(tmp, path)
+        return keypoints, descriptors
+
+    def _create_matcher(self):
+        if self.norm == cv.NORM_L2:
+            return cv.FlannBasedMatcher(dict(algorithm=FLANN_INDEX_KDTREE, trees=5), dict(checks=50))
+        return cv.BFMatcher(self.norm)
+
+    def detect(self, image):
+        keypoints, descriptors = self.detector.detectAndCompute(image, None)
+        if descriptors is None:
+            descriptors = np.empty((0, self.detector.descriptorSize()),
+                                   np.float32 if self.norm == cv.NORM_L2 else np.uint8)
+        return keypoints, descriptors
+
+    def match(self, descriptors):
+        """ Frame to template matches passing the ratio test """
+        if len(descriptors) < 2:
+            return []
+        good = []
+        for pair in self.matcher.knnMatch(descriptors, k=2):
+            if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance:
+                good.append(pair[0])
+        return good
+
+    def align(self, frame):
+        """ Align a frame (file name or grayscale array) against the template """
+        frame = read_gray(frame)
+        timings = {}
+        start = perf_counter()
+        keypoints, descriptors = self.detect(frame)
+        timings["detect"] = perf_counter() - start
+
+        start = perf_counter()
+        good = self.match(descriptors)
+        timings["match"] = perf_counter() - start
+
+        start = perf_counter()
+        homography, mask = self.estimate(good, keypoints)
+        timings["ransac"] = perf_counter() - start
+        inliers = 0 if mask is None else int(mask.sum())
+        return Alignment(homography, len(good), inliers, timings,
+                         keypoints=keypoints, matches=good, mask=mask)
+
+    def estimate(self, good, keypoints):
+        """ RANSAC homography from template to frame, (None, None) if too few matches """
+        if len(good) < self.min_matches:
+            return None, None
+        src_pts = np.float32([self.keypoints[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+        dst_pts = np.float32([keypoints[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+        return cv.findHomography(src_pts, dst_pts, cv.RANSAC, self.ransac_threshold)
+
+    def corners(self):
+        h, w = self.template.shape[:2]
+        return np.float32([[0, 0], [0, h - 1], [w - 1, h - 1], [w - 1, 0]]).reshape(-1, 1, 2)
+
+    def project_corners(self, homography):
+        """ Template corners in frame pixels """
+        return cv.perspectiveTransform(self.corners(), homography)
+
+
+class PyramidAligner(TemplateAligner):
+    """
+    Coarse-to-fine alignment for large frames.
+
+    The homography is first estimated on template and frame downscaled by
+    scale. Features are then detected at full resolution only in windows of
+    2 * window pixels around the projected template corners. Matches that
+    agree with the coarse estimate within gate pixels give the final
+    homography; if there are fewer than min_matches of them the upscaled
+    coarse inliers are added to the fit, and with fewer than four the
+    upscaled coarse estimate is returned.
+    """
+
+    def __init__(self, template, detector="sift", params=None, cache_dir=None,
+                 ratio=0.7, min_matches=10, ransac_threshold=5.0,
+                 scale=0.25, window=128, gate=None):
+        super().__init__(template, detector, params, cache_dir, ratio, min_matches, ransac_threshold)
+        self.scale = scale
+        self.window = window
+        # a coarse pixel is 1 / scale full resolution pixels
+        self.gate = gate if gate is not None else 2 * ransac_threshold / scale
+        small = cv.resize(self.template, None, fx=scale, fy=scale, interpolation=cv.INTER_AREA)
+        self.coarse = TemplateAligner(small, detector, params, cache_dir,
+                                      ratio, min_matches, ransac_threshold)
+
+    def upscale(self, homography):
+        """ Full resolution homography of a coarse one """
+        s = np.diag([self.scale, self.scale, 1.0])
+        return np.linalg.inv(s) @ homography @ s
+
+    def detect_windows(self, frame, centers):
+        """ Keypoints and descriptors detected in windows around centers, in frame pixels """
+        h, w = frame.shape[:2]
+        keypoints, descriptors = [], []
+        for x, y in centers:
+            x0, x1 = int(max(x - self.window, 0)), int(min(x + self.window, w))
+            y0, y1 = int(max(y - self.window, 0)), int(min(y + self.window, h))
+            if x1 - x0 < 16 or y1 - y0 < 16:
+                continue  # corner projected outside the frame
+            kps, des = self.detect(frame[y0:y1, x0:x1])
+            for kp in kps:
+                kp.pt = (kp.pt[0] + x0, kp.pt[1] + y0)
+            keypoints.extend(kps)
+            descriptors.append(des)
+        if not descriptors:
+            return self.detect(frame[:0, :0])
+        return keypoints, np.concatenate(descriptors)
+
+    def align(self, frame):
+        frame = read_gray(frame)
+        timings = {}
+        start = perf_counter()
+        small = cv.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv.INTER_AREA)
+        timings["resize"] = perf_counter() - start
+        coarse = self.coarse.align(small)
+        timings.update({f"coarse_{stage}": t for stage, t in coarse.timings.items()})
+        if not coarse.success:
+            return Alignment(None, coarse.good, 0, timings)
+        guess = self.upscale(coarse.homography)
+
+        start = perf_counter()
+        keypoints, descriptors = self.detect_windows(frame, self.project_corners(guess).reshape(-1, 2))
+        timings["detect"] = perf_counter() - start
+
+        start = perf_counter()
+        good = self.match(descriptors)
+        timings["match"] = perf_counter() - start
+
+        start = perf_counter()
+        src = np.float32([self.keypoints[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+        dst = np.float32([keypoints[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+        if good:
+            # keep the fine matches the coarse estimate agrees with
+            error = np.linalg.norm(cv.perspectiveTransform(src, guess) - dst, axis=2).ravel()
+            agree = error < self.gate
+            good = [m for m, ok in zip(good, agree) if ok]
+            src, dst = src[agree], dst[agree]
+        homography, mask, inliers = guess, None, coarse.inliers
+        if len(good) < self.min_matches and len(good) >= 4:
+            # too few to stand alone, the upscaled coarse inliers fill in
+            inlier = coarse.mask.ravel().astype(bool)
+            coarse_src = np.float32([self.coarse.keypoints[m.trainIdx].pt
+                                     for m in coarse.matches]).reshape(-1, 1, 2)[inlier] / self.scale
+            coarse_dst = np.float32([coarse.keypoints[m.queryIdx].pt
+                                     for m in coarse.matches]).reshape(-1, 1, 2)[inlier] / self.scale
+            src, dst = np.concatenate([src, coarse_src]), np.concatenate([dst, coarse_dst])
+        if len(good) >= 4:
+            refined, refined_mask = cv.findHomography(src, dst, cv.RANSAC, self.ransac_threshold)
+            if refined is not None:
+                homography, inliers = refined, int(refined_mask.sum())
+                mask = refined_mask[:len(good)]
+        timings["ransac"] = perf_counter() - start
+        return Alignment(homography, len(good) if mask is not None else coarse.good, inliers, timings,
+                         keypoints=keypoints, matches=good, mask=mask)
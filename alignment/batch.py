@@ -0,0 +1,112 @@
+"""
+Align a directory, or a list, of camera frames against one template.
+
+Frames run on a process pool with one TemplateAligner per worker. Results
+are written to a JSONL file in input order as soon as they are available,
+with at most a bounded number of frames in flight.
+
+    python -m alignment.batch mask.bmp frames/ --output results.jsonl --cache-dir cache
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from alignment.aligner import DETECTORS, TemplateAligner, read_gray
+
+IMAGE_EXTENSIONS = (".bmp", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+_aligner = None
+
+
+def _init_worker(template, detector, params, cache_dir):
+    global _aligner
+    _aligner = TemplateAligner(template, detector, params, cache_dir)
+
+
+def _align_frame(path):
+    record = {"frame": path}
+    try:
+        start = perf_counter()
+        frame = read_gray(path)
+        record["read_time"] = perf_counter() - start
+        record.update(_aligner.align(frame).as_dict())
+    except Exception as e:
+        # one unreadable frame must not end a nightly run
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def list_frames(source):
+    """ Image files in a directory, sorted, or the lines of a list file """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if name.lower().endswith(IMAGE_EXTENSIONS))
+    with open(source) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def align_frames(template, frames, detector="sift", params=None, cache_dir=None,
+                 workers=None, max_in_flight=None):
+    """
+    Yield one record per frame, in the order of frames.
+
+    max_in_flight bounds the number of submitted but not yet consumed frames,
+    by default four per worker. workers=1 aligns in-process.
+    """
+    # warm the feature cache once, so the workers only load it
+    _init_worker(template, detector, params, cache_dir)
+    if workers == 1:
+        for path in frames:
+            yield _align_frame(path)
+        return
+
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 4 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(template, detector, params, cache_dir)) as pool:
+        pending = deque()
+        for path in frames:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(pool.submit(_align_frame, path))
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("template", help="template image")
+    parser.add_argument("frames", help="directory of frames, or a file listing one frame per line")
+    parser.add_argument("--output", default="-", help="JSONL file ('-' for stdout)")
+    parser.add_argument("--detector", default="sift", choices=list(DETECTORS))
+    parser.add_argument("--cache-dir", default=None, help="template feature cache directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    frames = list_frames(args.frames)
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    aligned = 0
+    start = perf_counter()
+    try:
+        for index, record in enumerate(align_frames(args.template, frames, args.detector,
+                                                    cache_dir=args.cache_dir,
+                                                    workers=args.workers,
+                                                    max_in_flight=args.max_in_flight)):
+            out.write(json.dumps({"index": index, **record}) + "\n")
+            out.flush()
+            aligned += record.get("homography") is not None
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = perf_counter() - start
+    print(f"{aligned}/{len(frames)} frames aligned in {elapsed:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Identify which of many templates appears in a frame.
+
+All template descriptors go into one approximate nearest neighbour index,
+LSH for binary ORB descriptors and randomized KD-trees for SIFT, so a frame
+is matched against the whole library at once instead of template by
+template. Each frame feature that passes the ratio test votes for the
+template its nearest neighbour belongs to.
+"""
+
+import json
+import os
+
+import cv2 as cv
+import numpy as np
+
+from alignment.aligner import DETECTORS, keypoints_to_array, read_gray
+
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+
+INDEX_PARAMS = {"sift": dict(algorithm=FLANN_INDEX_KDTREE, trees=5),
+                "orb": dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)}
+
+
+class TemplateLibrary:
+    """
+    Descriptor index over a set of templates.
+
+    Templates added after the last build are kept in a pending set that is
+    searched by brute force; the index is rebuilt once the pending set grows
+    beyond rebuild_fraction of the indexed descriptors, or by rebuild().
+
+    ratio: Lowe's ratio test threshold between the two nearest neighbours.
+    min_votes: votes a template needs for identify() to report it.
+    checks: leaves visited per search, higher is slower and more exact.
+    """
+
+    def __init__(self, detector="orb", params=None, ratio=0.75, min_votes=10,
+                 checks=50, rebuild_fraction=0.25):
+        if detector not in DETECTORS:
+            raise ValueError(f"unknown detector {detector!r}, choose from {', '.join(DETECTORS)}")
+        self.detector_name = detector
+        self.params = dict(params or {})
+        self.ratio = ratio
+        self.min_votes = min_votes
+        self.checks = checks
+        self.rebuild_fraction = rebuild_fraction
+
+        factory, self.norm = DETECTORS[detector]
+        self.detector = factory(**self.params)
+        dtype = np.float32 if self.norm == cv.NORM_L2 else np.uint8
+        self.template_ids = []
+        # descriptors, their keypoints and the index of the template they belong to
+        self.descriptors = np.empty((0, self.detector.descriptorSize()), dtype)
+        self.keypoints = np.empty((0, 7))
+        self.owners = np.empty(0, np.int32)
+        self.index = None
+        self.indexed = 0  # the first indexed descriptors are in the index
+
+    def __len__(self):
+        return len(self.template_ids)
+
+    def detect(self, image):
+        keypoints, descriptors = self.detector.detectAndCompute(read_gray(image), None)
+        if descriptors is None:
+            return np.empty((0, 7)), self.descriptors[:0]
+        return keypoints_to_array(keypoints), descriptors
+
+    def add(self, template_id, image):
+        """ Add a template (file name or grayscale array) under template_id """
+        if template_id in self.template_ids:
+            raise ValueError(f"template {template_id!r} is already in the library")
+        keypoints, descriptors = self.detect(image)
+        owner = len(self.template_ids)
+        self.template_ids.append(template_id)
+        self.descriptors = np.concatenate([self.descriptors, descriptors])
+        self.keypoints = np.concatenate([self.keypoints, keypoints])
+        self.owners = np.concatenate([self.owners, np.full(len(descriptors), owner, np.int32)])
+
+    def rebuild(self):
+        """ Index all descriptors, including the pending ones """
+        self.index = None
+        self.indexed = 0
+        if len(self.descriptors):
+            self.index = cv.flann_Index(self.descriptors, INDEX_PARAMS[self.detector_name])
+            self.indexed = len(self.descriptors)
+
+    def _pending(self):
+        return len(self.descriptors) - self.indexed
+
+    def _search(self, query):
+        """ Library indices and distances of the two nearest neighbours of each query row """
+        if self._pending() > self.rebuild_fraction * self.indexed:
+            self.rebuild()
+        indices = np.full((len(query), 2), -1, np.int64)
+        distances = np.full((len(query), 2), np.inf)
+        if self.index is not None:
+            found, dist = self.index.knnSearch(query, 2, params=dict(checks=self.checks))
+            indices[:], distances[:] = found, dist
+            if self.norm == cv.NORM_L2:
+                distances = np.sqrt(distances)  # the KD-tree reports squared distances
+            distances[indices < 0] = np.inf
+
+        if self._pending():
+            pending_indices = np.full_like(indices, -1)
+            pending_distances = np.full_like(distances, np.inf)
+            matcher = cv.BFMatcher(self.norm)
+            for row, pair in enumerate(matcher.knnMatch(query, self.descriptors[self.indexed:], k=2)):
+                for col, m in enumerate(pair):
+                    pending_indices[row, col] = m.trainIdx + self.indexed
+                    pending_distances[row, col] = m.distance
+            # two nearest of the index and the pending neighbours together
+            indices = np.hstack([indices, pending_indices])
+            distances = np.hstack([distances, pending_distances])
+            order = np.argsort(distances, axis=1, kind="stable")[:, :2]
+            indices = np.take_along_axis(indices, order, axis=1)
+            distances = np.take_along_axis(distances, order, axis=1)
+        return indices, distances
+
+    def votes(self, frame):
+        """ Number of ratio-test matches per template, in the order templates were added """
+        _, descriptors = self.detect(frame)
+        if not len(descriptors) or not len(self.descriptors):
+            return np.zeros(len(self.template_ids), np.int64)
+        indices, distances = self._search(descriptors)
+        good = (indices[:, 0] >= 0) & (distances[:, 0] < self.ratio * distances[:, 1])
+        return np.bincount(self.owners[indices[good, 0]], minlength=len(self.template_ids))
+
+    def identify(self, frame):
+        """ (template_id, votes) of the best template, template_id is None below min_votes """
+        votes = self.votes(frame)
+        if not len(votes):
+            return None, 0
+        best = int(np.argmax(votes))
+        if votes[best] < self.min_votes:
+            return None, int(votes[best])
+        return self.template_ids[best], int(votes[best])
+
+    def save(self, path):
+        """
+        Write the library to <path>.npz and the KD-tree index to <path>.flann.
+        OpenCV cannot load a saved LSH index, ORB libraries rebuild it on load.
+        """
+        self.rebuild()
+        meta = {"detector": self.detector_name, "params": self.params, "template_ids": self.template_ids,
+                "ratio": self.ratio, "min_votes": self.min_votes, "checks": self.checks,
+                "rebuild_fraction": self.rebuild_fraction}
+        np.savez(f"{path}.npz", descriptors=self.descriptors, keypoints=self.keypoints,
+                 owners=self.owners, meta=json.dumps(meta))
+        if self.index is not None and self.detector_name == "sift":
+            self.index.save(f"{path}.flann")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(f"{path}.npz") as data:
+            meta = json.loads(str(data["meta"]))
+            library = cls(meta["detector"], meta["params"], meta["ratio"], meta["min_votes"],
+                          meta["checks"], meta["rebuild_fraction"])
+            library.template_ids = meta["template_ids"]
+            library.descriptors = data["descriptors"]
+            library.keypoints = data["keypoints"]
+            library.owners = data["owners"]
+        if os.path.exists(f"{path}.flann") and library.detector_name == "sift" and len(library.descriptors):
+            library.index = cv.flann_Index()
+            library.index.load(library.descriptors, f"{path}.flann")
+            library.indexed = len(library.descriptors)
+        else:
+            library.rebuild()
+        return library
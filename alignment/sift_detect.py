@@ -1,49 +1,36 @@
 from os import path
 import cv2 as cv
+import numpy as np
+
+from alignment.aligner import TemplateAligner
 
 my_dir = path.dirname(__file__)
 mask_file = path.join(my_dir, 'data', 'mask.bmp')
 camera_file = path.join(my_dir, 'data', 'image_left.bmp')
+cache_dir = path.join(my_dir, 'data', 'cache')
 
 from matplotlib import pyplot as plt
 
-MIN_MATCH_COUNT = 10
-img1 = cv.imread(mask_file, cv.IMREAD_GRAYSCALE)  # queryImage
+# the template's SIFT features are computed once and cached in data/cache
+aligner = TemplateAligner(mask_file, detector="sift", cache_dir=cache_dir)
+img1 = aligner.template  # queryImage
 img2 = cv.imread(camera_file, cv.IMREAD_GRAYSCALE)  # trainImage
+result = aligner.align(img2)
 
-# Initiate SIFT detector
-sift = cv.SIFT_create()
-# find the keypoints and descriptors with SIFT
-kp1, des1 = sift.detectAndCompute(img1, None)
-kp2, des2 = sift.detectAndCompute(img2, None)
-FLANN_INDEX_KDTREE = 1
-index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-search_params = dict(checks=50)
-flann = cv.FlannBasedMatcher(index_params, search_params)
-matches = flann.knnMatch(des1, des2, k=2)
-# store all the good matches as per Lowe's ratio test.
-good = []
-for m, n in matches:
-    if m.distance < 0.7 * n.distance:
-        good.append(m)
-
-if len(good) > MIN_MATCH_COUNT:
-    src_pts = np.float32([kp1[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-    dst_pts = np.float32([kp2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
-    M, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, 5.0)
-    matchesMask = mask.ravel().tolist()
-    h, w = img1.shape
-    pts = np.float32([[0, 0], [0, h - 1], [w - 1, h - 1], [w - 1, 0]]).reshape(-1, 1, 2)
-    dst = cv.perspectiveTransform(pts, M)
+if result.success:
+    matchesMask = result.mask.ravel().tolist()
+    dst = aligner.project_corners(result.homography)
     img2 = cv.polylines(img2, [np.int32(dst)], True, 255, 3, cv.LINE_AA)
 else:
-    print("Not enough matches are found - {}/{}".format(len(good), MIN_MATCH_COUNT))
+    print("Not enough matches are found - {}/{}".format(result.good, aligner.min_matches))
     matchesMask = None
 
+# the aligner matches frame to template, drawMatches wants template to frame
+good = [cv.DMatch(m.trainIdx, m.queryIdx, m.distance) for m in result.matches]
 draw_params = dict(matchColor=(0, 255, 0),  # draw matches in green color
                    singlePointColor=None,
                    matchesMask=matchesMask,  # draw only inliers
                    flags=2)
-img3 = cv.drawMatches(img1, kp1, img2, kp2, good, None, **draw_params)
+img3 = cv.drawMatches(img1, aligner.keypoints, img2, result.keypoints, good, None, **draw_params)
 
 plt.imshow(img3, 'gray'), plt.show()
@@ -0,0 +1,133 @@
+"""
+Feature detection on images too large to process in one piece.
+
+The image is cut into tiles that overlap by a margin, tiles are detected on
+a thread pool (OpenCV releases the GIL) with one detector per thread, and a
+keypoint is only kept by the tile whose core, the tile without the margin,
+contains it. Uncompressed BMP files are memory mapped, so only the tiles
+being worked on are read.
+"""
+
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2 as cv
+import numpy as np
+
+from alignment.aligner import DETECTORS, keypoints_to_array, read_gray
+
+
+def open_bmp(path):
+    """
+    Memory map an uncompressed 8 bit grayscale or 24 bit BMP file as an
+    array of shape (height, width) or (height, width, 3), top row first.
+    Returns None for anything else.
+    """
+    with open(path, "rb") as f:
+        header = f.read(54)
+        if len(header) < 54 or header[:2] != b"BM":
+            return None
+        offset, = struct.unpack_from("<I", header, 10)
+        header_size, width, height, _, bpp, compression = struct.unpack_from("<IiiHHI", header, 14)
+        if compression != 0 or bpp not in (8, 24):
+            return None
+        if bpp == 8:
+            # only a gray ramp palette maps indices to intensities
+            f.seek(14 + header_size)
+            palette = np.frombuffer(f.read(1024), np.uint8).reshape(-1, 4)
+            if len(palette) != 256 or np.any(palette[:, :3] != np.arange(256)[:, None]):
+                return None
+
+    channels = bpp // 8
+    stride = (width * bpp + 31) // 32 * 4
+    rows = np.memmap(path, np.uint8, "r", offset, shape=(abs(height), stride))
+    if height > 0:
+        rows = rows[::-1]  # stored bottom-up
+    image = rows[:, :width * channels]
+    return image if channels == 1 else image.reshape(abs(height), width, 3)
+
+
+def open_image(image):
+    """ A memory map of a BMP file, any other file read as grayscale, or the array itself """
+    if isinstance(image, (str, os.PathLike)) and os.fspath(image).lower().endswith(".bmp"):
+        mapped = open_bmp(image)
+        if mapped is not None:
+            return mapped
+    return read_gray(image)
+
+
+def tiles(shape, tile, overlap):
+    """ (window, core) slices of each tile, the window is the core plus overlap """
+    rows, cols = shape[:2]
+    for y0 in range(0, rows, tile):
+        for x0 in range(0, cols, tile):
+            y1, x1 = min(y0 + tile, rows), min(x0 + tile, cols)
+            window = (max(y0 - overlap, 0), min(y1 + overlap, rows),
+                      max(x0 - overlap, 0), min(x1 + overlap, cols))
+            yield window, (y0, y1, x0, x1)
+
+
+class TiledDetector:
+    """
+    Detect features tile by tile.
+
+    tile: core size of a tile in pixels.
+    overlap: margin around each core; keypoints closer to a tile border than
+        this may be missed or get truncated descriptors, so it should exceed
+        the descriptor radius of the largest features of interest.
+    workers: detection threads, None uses all cores.
+    """
+
+    def __init__(self, detector="sift", params=None, tile=2048, overlap=64, workers=None):
+        if detector not in DETECTORS:
+            raise ValueError(f"unknown detector {detector!r}, choose from {', '.join(DETECTORS)}")
+        self.detector_name = detector
+        self.params = dict(params or {})
+        self.tile = tile
+        self.overlap = overlap
+        self.workers = workers or os.cpu_count()
+        self._local = threading.local()
+
+    def _detector(self):
+        # OpenCV detectors are not safe to share between threads
+        if not hasattr(self._local, "detector"):
+            factory, _ = DETECTORS[self.detector_name]
+            self._local.detector = factory(**self.params)
+        return self._local.detector
+
+    def _detect_tile(self, image, window, core):
+        wy0, wy1, wx0, wx1 = window
+        y0, y1, x0, x1 = core
+        pixels = np.ascontiguousarray(image[wy0:wy1, wx0:wx1])
+        if pixels.ndim == 3:
+            pixels = cv.cvtColor(pixels, cv.COLOR_BGR2GRAY)
+        detector = self._detector()
+        keypoints, descriptors = detector.detectAndCompute(pixels, None)
+        if descriptors is None:
+            return np.empty((0, 7)), None
+        points = keypoints_to_array(keypoints)
+        points[:, 0] += wx0
+        points[:, 1] += wy0
+        # the tile owning the core keeps the keypoint, overlaps drop duplicates
+        owned = ((points[:, 0] >= x0) & (points[:, 0] < x1) &
+                 (points[:, 1] >= y0) & (points[:, 1] < y1))
+        return points[owned], descriptors[owned]
+
+    def detect(self, image):
+        """
+        Keypoints as an (n, 7) array (see keypoints_to_array) and their
+        descriptors, for an image file name or array.
+        """
+        image = open_image(image)
+        parts = list(tiles(image.shape, self.tile, self.overlap))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda part: self._detect_tile(image, *part), parts))
+
+        descriptors = [d for _, d in results if d is not None]
+        if not descriptors:
+            norm = DETECTORS[self.detector_name][1]
+            size = self._detector().descriptorSize()
+            return np.empty((0, 7)), np.empty((0, size), np.float32 if norm == cv.NORM_L2 else np.uint8)
+        return np.concatenate([p for p, _ in results]), np.concatenate(descriptors)
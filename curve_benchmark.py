@@ -0,0 +1,177 @@
+"""
+Headless benchmark of the curve and spline code paths.
+
+    python curve_benchmark.py --output bench.json
+    python curve_benchmark.py --baseline bench.json --threshold 1.25
+
+Times BezierItem path rebuilds, the cardioid fit of curve_fit.py and the
+periodic spline setup of spline_fit.py over a range of sizes, with the peak
+traced memory and the net number of allocated blocks per operation. With
+--baseline the medians are compared against a previous run and the exit
+status is 1 if any operation got slower than the threshold ratio.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from time import perf_counter
+
+# must be set before Qt is imported
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import scipy
+from PySide6 import QtCore, QtWidgets
+from scipy.interpolate import CubicSpline, splrep
+
+# curve_fit selects matplotlib's Qt backend on import, which needs a QApplication
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+from curve_fit import fit_cardioid  # noqa: E402
+from gui.bezier_curves import BezierItem  # noqa: E402
+from splines.streaming import StreamingPeriodicSpline  # noqa: E402
+
+
+def measure(func, repeats):
+    """ Median and minimum time of func(), then peak memory and net blocks of one more call """
+    func()  # warm up caches
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    func()
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {"median": float(np.median(times)),
+            "min": float(np.min(times)),
+            "repeats": repeats,
+            "peak_bytes": peak,
+            "net_blocks": blocks}
+
+
+def random_points(count, seed=0):
+    return np.random.default_rng(seed).uniform(0, 1000, (count, 2)).tolist()
+
+
+def bezier_cases(counts, precisions):
+    for count in counts:
+        for precision in precisions:
+            for mode, name in ((BezierItem.BezierMode, "bezier_rebuild"),
+                               (BezierItem.BSplineMode, "bspline_rebuild")):
+                item = BezierItem(random_points(count))
+                item.setMode(mode)
+                item.setPrecision(precision)
+                yield name, {"count": count, "precision": precision}, item._rebuildPath
+
+            item = BezierItem(random_points(count))
+            item.setPrecision(precision)
+            positions = [QtCore.QPointF(x, y) for x, y in random_points(64, seed=1)]
+
+            # the closure holds the item, the control points die with it
+            def move(item=item, index=count // 2, positions=positions):
+                ctrl = item.controlItems[index]
+                for pos in positions:
+                    ctrl.setPos(pos)
+            yield "bezier_move_x64", {"count": count, "precision": precision}, move
+
+
+def fit_cases(num_points, spline_points):
+    for n in num_points:
+        for samples in spline_points:
+            yield "cardioid_fit", {"num_points": n, "spline_points": samples}, \
+                lambda n=n, samples=samples: fit_cardioid(n, samples)
+
+
+def periodic_cases(sizes):
+    for size in sizes:
+        x = np.linspace(0, 10 * np.pi, size)
+        y = np.sin(x)
+        y[-1] = y[0]
+        yield "cubic_spline_periodic", {"size": size}, \
+            lambda x=x, y=y: CubicSpline(x, y, bc_type='periodic')
+        yield "splrep_periodic", {"size": size}, \
+            lambda x=x, y=y: splrep(x, y, per=True, k=3)
+        yield "streaming_lsq_periodic", {"size": size}, \
+            lambda x=x, y=y: StreamingPeriodicSpline(max(4, size // 10), 10 * np.pi).fit([(x[:-1], y[:-1])])
+
+
+def case_key(result):
+    return result["name"] + "".join(f" {k}={v}" for k, v in sorted(result["params"].items()))
+
+
+def run(args):
+    cases = [*bezier_cases(args.counts, args.precisions),
+             *fit_cases(args.num_points, args.spline_points),
+             *periodic_cases(args.sizes)]
+    results = []
+    for name, params, func in cases:
+        result = {"name": name, "params": params, **measure(func, args.repeats)}
+        results.append(result)
+        print(f"{case_key(result):55s} {result['median'] * 1e3:10.3f} ms", file=sys.stderr)
+    meta = {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "qt": QtCore.qVersion()}
+    return {"meta": meta, "results": results}
+
+
+def compare(report, baseline, threshold):
+    """ Print the median ratio against the baseline, return the regressed cases """
+    previous = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        key = case_key(result)
+        if key not in previous:
+            continue
+        ratio = result["median"] / previous[key]["median"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{key:55s} {ratio:6.2f}x {flag}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", nargs="+", type=int, default=[4, 8, 16, 32, 64],
+                        help="Bezier control point counts")
+    parser.add_argument("--precisions", nargs="+", type=float, default=[.05, .01])
+    parser.add_argument("--num-points", nargs="+", type=int, default=[20, 100])
+    parser.add_argument("--spline-points", nargs="+", type=int, default=[500, 5000])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000],
+                        help="sample counts of the periodic spline setup")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default="-", help="JSON report file ('-' for stdout)")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="median time ratio above which a case counts as regressed")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
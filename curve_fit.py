@@ -1,6 +1,11 @@
 import os
 import numpy as np
-from PySide6.QtCore import QSettings
+from PySide6.QtCore import (QObject,
+                            QRunnable,
+                            QSettings,
+                            QThreadPool,
+                            QTimer,
+                            Signal)
 from PySide6.QtWidgets import (QApplication,
                                QMainWindow,
                                QWidget,
@@ -8,6 +13,8 @@ from PySide6.QtWidgets import (QApplication,
                                QSpinBox)
 
 from scipy.interpolate import splprep, splev
+from gui.lod import LevelOfDetail
+from splines.arclength import ArcLengthTable
 import matplotlib.pyplot as plt
 
 import matplotlib
@@ -16,6 +23,38 @@ matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 
 
+def fit_cardioid(num_points, spline_points):
+    """ Sample a cardioid at num_points and fit a closed cubic spline through it """
+    phi = np.linspace(0, 2.0 * np.pi, num_points, endpoint=True)
+    r = 1.0 + np.cos(phi)  # polar coords
+    x, y = r * np.cos(phi), r * np.sin(phi)  # convert to cartesian
+
+    tck, u = splprep([x, y], s=0, k=3)
+    new_u = np.linspace(0.0, 1.0, spline_points, endpoint=True)
+    new_points = splev(new_u, tck)
+    return x, y, tck, new_points
+
+
+class FitSignals(QObject):
+    # generation, (num_points, spline_points, fit_cardioid result)
+    finished = Signal(int, object)
+
+
+class FitTask(QRunnable):
+    """ Runs fit_cardioid on a QThreadPool thread and reports back through signals """
+
+    def __init__(self, signals, generation, num_points, spline_points):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.num_points = num_points
+        self.spline_points = spline_points
+
+    def run(self):
+        fit = fit_cardioid(self.num_points, self.spline_points)
+        self.signals.finished.emit(self.generation, (self.num_points, self.spline_points, fit))
+
+
 class PlotCanvas(FigureCanvasQTAgg):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
         self.fig, self.ax = plt.subplots(figsize=(width, height), dpi=dpi)
@@ -25,34 +64,107 @@ class PlotCanvas(FigureCanvasQTAgg):
         self.num_points = 20
         self.spline_points = 500
 
-    def set_spline_points(self, val):
-        self.spline_points = val
+        # the lines are created once and blitted over a cached background,
+        # a plain repaint only copies the last rendered buffer
+        self.data_line, = self.ax.plot([], [], 'bo-', animated=True)
+        self.control_line, = self.ax.plot([], [], 'go', animated=True)
+        self.spline_line, = self.ax.plot([], [], 'r-', animated=True)
+        self.background = None
+        self.tck = None
+        self.arc_table = None
+        # spline_points is the upper limit, the curve's size on screen decides
+        self.lod = LevelOfDetail(pixels_per_sample=2, maximum=1000)
+        self.sampled_points = 0
+        self.curve_bounds = None
+        self.mpl_connect('draw_event', self.on_draw)
+        self.refit()
 
+    def set_spline_points(self, val):
+        if val != self.spline_points:
+            self.spline_points = val
+            self.refit()
 
     def set_resolution(self, val):
-        self.num_points = val
-
-    def paintEvent(self, event):
-        # ERASE THE CANVAS
-        self.ax.clear()
-
-        # recompute the data
-        phi = np.linspace(0, 2.0 * np.pi, self.num_points, endpoint=True)
-        r = 1.0 + np.cos(phi)  # polar coords
-        x, y = r * np.cos(phi), r * np.sin(phi)  # convert to cartesian
-
-        tck, u = splprep([x, y], s=0, k=3)
-        new_u = np.linspace(0.0, 1.0, self.spline_points, endpoint=True)
-        new_points = splev(new_u, tck)
+        if val != self.num_points:
+            self.num_points = val
+            self.refit()
+
+    def refit(self):
+        self.show_fit(fit_cardioid(self.num_points, self.spline_points))
+
+    def set_fit(self, num_points, spline_points, fit):
+        """ Show a fit computed elsewhere, e.g. on a worker thread """
+        self.num_points = num_points
+        self.spline_points = spline_points
+        self.show_fit(fit)
+
+    def show_fit(self, fit):
+        x, y, tck, new_points = fit
+        self.tck = tck
+        self.arc_table = None  # belongs to the previous fit
         knots, control_points, degree = tck
-        self.ax.plot(x, y, 'bo-')
-        self.ax.plot(control_points[0], control_points[1], 'go')
-        self.ax.plot(new_points[0], new_points[1], 'r-')
-        self.fig.canvas.draw()
-        super().paintEvent(event)
+        self.data_line.set_data(x, y)
+        self.control_line.set_data(control_points[0], control_points[1])
+        self.spline_line.set_data(new_points[0], new_points[1])
+        self.sampled_points = len(new_points[0])
+        self.curve_bounds = np.array([[np.min(new_points[0]), np.min(new_points[1])],
+                                      [np.max(new_points[0]), np.max(new_points[1])]])
+        self.resample()
+
+        all_x = np.concatenate([x, control_points[0], new_points[0]])
+        all_y = np.concatenate([y, control_points[1], new_points[1]])
+        limits = self.padded_limits(all_x), self.padded_limits(all_y)
+        if self.background is None or limits != (self.ax.get_xlim(), self.ax.get_ylim()):
+            # the axes change, the background has to be rendered again
+            self.ax.set_xlim(*limits[0])
+            self.ax.set_ylim(*limits[1])
+            self.draw_idle()
+        else:
+            self.restore_region(self.background)
+            self.draw_lines()
+            self.blit(self.fig.bbox)
+
+    def visible_points(self):
+        """ Spline samples worth drawing at the curve's current size in pixels """
+        corners = self.ax.transData.transform(self.curve_bounds)
+        extent = np.hypot(*(corners[1] - corners[0]))
+        return min(self.spline_points, self.lod.samples(extent))
+
+    def resample(self):
+        """ Re-evaluate the spline line if its on-screen level of detail changed """
+        count = self.visible_points()
+        if count != self.sampled_points:
+            new_points = splev(np.linspace(0.0, 1.0, count, endpoint=True), self.tck)
+            self.spline_line.set_data(new_points[0], new_points[1])
+            self.sampled_points = count
+
+    def arc_length_table(self):
+        """ Arc-length lookup of the current fit, built on first use after a refit """
+        if self.arc_table is None:
+            self.arc_table = ArcLengthTable(self.tck)
+        return self.arc_table
+
+    @staticmethod
+    def padded_limits(values, margin=0.05):
+        lo, hi = float(np.min(values)), float(np.max(values))
+        pad = (hi - lo) * margin
+        return lo - pad, hi + pad
+
+    def draw_lines(self):
+        for line in (self.data_line, self.control_line, self.spline_line):
+            self.ax.draw_artist(line)
+
+    def on_draw(self, event):
+        # a resize changes the curve's size on screen
+        self.resample()
+        self.background = self.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
 
 
 class MainWin(QMainWindow):
+    # spin box changes within this many ms are fitted together
+    FIT_DELAY_MS = 50
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("PySide6 with Matplotlib")
@@ -66,15 +178,26 @@ class MainWin(QMainWindow):
         spl_pts_spin.setRange(1, 1000)
         spl_pts_spin.setSingleStep(10)
         spl_pts_spin.setValue(500)
-        spl_pts_spin.valueChanged.connect(self.canvas.set_spline_points)
+        spl_pts_spin.valueChanged.connect(self.schedule_fit)
         layout.addWidget(spl_pts_spin)
+        self.spl_pts_spin = spl_pts_spin
 
         res_spin = QSpinBox()
         res_spin.setFixedWidth(100)
         res_spin.setRange(4, 100)
         res_spin.setValue(20)
-        res_spin.valueChanged.connect(self.canvas.set_resolution)
+        res_spin.valueChanged.connect(self.schedule_fit)
         layout.addWidget(res_spin)
+        self.res_spin = res_spin
+
+        # spin box changes restart the timer, only the last one starts a fit
+        self.fit_timer = QTimer(self)
+        self.fit_timer.setSingleShot(True)
+        self.fit_timer.setInterval(self.FIT_DELAY_MS)
+        self.fit_timer.timeout.connect(self.start_fit)
+        self.fit_signals = FitSignals(self)
+        self.fit_signals.finished.connect(self.fit_finished)
+        self.fit_generation = 0
 
         central_widget.setLayout(layout)
         self.setCentralWidget(central_widget)
@@ -83,6 +206,21 @@ class MainWin(QMainWindow):
         self.resize(settings.value("size", self.size()))
         settings.endGroup()
 
+    def schedule_fit(self):
+        self.fit_timer.start()
+
+    def start_fit(self):
+        self.fit_generation += 1
+        task = FitTask(self.fit_signals, self.fit_generation,
+                       self.res_spin.value(), self.spl_pts_spin.value())
+        QThreadPool.globalInstance().start(task)
+
+    def fit_finished(self, generation, result):
+        # a newer request was started meanwhile, its result will follow
+        if generation != self.fit_generation:
+            return
+        self.canvas.set_fit(*result)
+
     def paintEvent(self, event):
         super().paintEvent(event)
 
@@ -3,9 +3,124 @@ https://stackoverflow.com/questions/71191764/add-mouse-motion-functionality-to-p
 """
 
 import random
-from math import factorial
+from functools import lru_cache
+from math import ceil
+
+import numpy as np
+import shiboken6
 from PySide6 import QtWidgets, QtGui, QtCore
 
+from gui.lod import LevelOfDetail
+
+
+@lru_cache(maxsize=8)
+def bernsteinBasis(count, steps):
+    '''
+    Return the (steps + 1, count) matrix of Bernstein weights: row s holds
+    the weight of each control point at u = s / steps, so the curve samples
+    are a single matrix product with the (count, 2) control point array.
+    The weights are computed in log space, which stays accurate for degrees
+    where factorial() based coefficients overflow or lose precision.
+    '''
+    n = count - 1
+    i = np.arange(count)
+    u = np.linspace(0, 1, steps + 1)[:, None]
+    logCoeffs = np.concatenate([[0.], np.cumsum(np.log((n - i[1:] + 1) / i[1:]))])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logWeights = (logCoeffs
+                      + np.where(i > 0, i * np.log(u), 0)
+                      + np.where(i < n, (n - i) * np.log1p(-u), 0))
+    basis = np.exp(logWeights)
+    basis.setflags(write=False)
+    return basis
+
+
+def _splitBezier(ctrl):
+    '''
+    Split the control polygon at u = 0.5 with de Casteljau's scheme and
+    return the control polygons of both halves.
+    '''
+    left = [ctrl[0]]
+    right = [ctrl[-1]]
+    work = ctrl
+    while len(work) > 1:
+        work = (work[:-1] + work[1:]) * .5
+        left.append(work[0])
+        right.append(work[-1])
+    return np.array(left), np.array(right[::-1])
+
+
+def _flatness(ctrl):
+    '''
+    Upper bound of the distance between the curve and its chord: the
+    largest distance of a control point from the chord line (the curve lies
+    in the convex hull of its control points).
+    '''
+    chord = ctrl[-1] - ctrl[0]
+    offsets = ctrl[1:-1] - ctrl[0]
+    if not len(offsets):
+        return 0.
+    length = np.hypot(*chord)
+    if length < 1e-12:
+        return np.hypot(offsets[:, 0], offsets[:, 1]).max()
+    return np.abs(offsets[:, 0] * chord[1] - offsets[:, 1] * chord[0]).max() / length
+
+
+def flattenBezier(points, tolerance, maxDepth=16):
+    '''
+    Sample the Bezier curve with control points (count, 2) adaptively: the
+    curve is subdivided until each piece deviates from its chord by no more
+    than tolerance. Nearly straight stretches end up with few samples,
+    tight bends with many.
+    '''
+    samples = [points[0]]
+    stack = [(np.asarray(points, dtype=float), 0)]
+    while stack:
+        ctrl, depth = stack.pop()
+        if depth >= maxDepth or _flatness(ctrl) <= tolerance:
+            samples.append(ctrl[-1])
+            continue
+        left, right = _splitBezier(ctrl)
+        stack.append((right, depth + 1))
+        stack.append((left, depth + 1))
+    return np.array(samples)
+
+
+def polygonFromArray(samples):
+    '''
+    Build a QPolygonF from an (n, 2) float array with a single copy into
+    the polygon's storage, instead of creating one QPointF per sample.
+    '''
+    polygon = QtGui.QPolygonF()
+    polygon.resize(len(samples))
+    if len(samples):
+        # data() wraps the first QPointF, its address is the start of the storage
+        storage = shiboken6.VoidPtr(polygon.data(), 16 * len(samples), True)
+        np.frombuffer(storage, np.float64).reshape(-1, 2)[:] = samples
+    return polygon
+
+
+@lru_cache(maxsize=8)
+def cubicBSplineBasis(steps):
+    '''
+    Return the (steps + 1, 4) matrix of uniform cubic B-spline weights of
+    the four control points of one segment at u = s / steps.
+    '''
+    u = np.linspace(0, 1, steps + 1)[:, None]
+    basis = np.hstack([(1 - u) ** 3,
+                       3 * u ** 3 - 6 * u ** 2 + 4,
+                       -3 * u ** 3 + 3 * u ** 2 + 3 * u + 1,
+                       u ** 3]) / 6
+    basis.setflags(write=False)
+    return basis
+
+
+# control points of the cubic Bezier equal to one uniform B-spline segment
+_bsplineToBezier = np.array([[1, 4, 1, 0],
+                             [0, 4, 2, 0],
+                             [0, 2, 4, 0],
+                             [0, 1, 4, 1]]) / 6
+
 
 class ControlPoint(QtWidgets.QGraphicsObject):
     moved = QtCore.Signal(int, QtCore.QPointF)
@@ -78,9 +193,24 @@ class ControlPoint(QtWidgets.QGraphicsObject):
 
 
 class BezierItem(QtWidgets.QGraphicsPathItem):
+    # one Bezier curve over all the control points, or a uniform cubic
+    # B-spline made of joined segments of four control points each
+    BezierMode, BSplineMode = range(2)
+
+    _mode = BezierMode
     _precision = .05
+    # maximum chord deviation in device pixels, None uses the fixed precision
+    _tolerance = None
+    _flattenScale = 1.
+    # LevelOfDetail choosing the step count from the on-screen size,
+    # None uses the fixed precision
+    _lod = None
+    _sampledSteps = 0
+    _rebuildScheduled = False
     _delayUpdatePath = False
     _ctrlPrototype = ControlPoint
+    # full rebuild after this many incremental moves, to drop rounding drift
+    _maxIncrementalMoves = 500
 
     def __init__(self, points=None):
         super().__init__()
@@ -91,6 +221,9 @@ class BezierItem(QtWidgets.QGraphicsPathItem):
 
         self.controlItems = []
         self._points = []
+        self._samples = None
+        self._segments = None
+        self._incrementalMoves = 0
 
         if points is not None:
             self.setPoints(points)
@@ -141,7 +274,13 @@ class BezierItem(QtWidgets.QGraphicsPathItem):
         self._points.insert(index, pos)
         self._createControlPoint(index, pos)
         if not self._delayUpdatePath:
-            self.updatePath()
+            if self._canUpdateSegments():
+                # new segments i - 1 .. i + 2 involve the point, the ones
+                # after them are the old segments shifted by one
+                self._rebuildOutline()
+                self._updateSegments(index - 1, index + 3, index + 2)
+            else:
+                self.updatePath()
 
     def removeControlPoint(self, cp):
         if isinstance(cp, int):
@@ -158,7 +297,11 @@ class BezierItem(QtWidgets.QGraphicsPathItem):
 
         del item, self._points[index]
 
-        self.updatePath()
+        if self._canUpdateSegments() and self._points:
+            self._rebuildOutline()
+            self._updateSegments(index - 1, index + 2, index + 3)
+        else:
+            self.updatePath()
 
     def precision(self):
         return self._precision
@@ -169,6 +312,67 @@ class BezierItem(QtWidgets.QGraphicsPathItem):
             self._precision = precision
             self._rebuildPath()
 
+    def mode(self):
+        return self._mode
+
+    def setMode(self, mode):
+        if self._mode != mode:
+            self._mode = mode
+            self._rebuildPath()
+
+    def tolerance(self):
+        return self._tolerance
+
+    def setTolerance(self, tolerance):
+        '''
+        Switch to adaptive flattening: the curve is subdivided until it
+        deviates from the drawn segments by at most tolerance device pixels
+        at the current view scale. None goes back to the fixed precision.
+        '''
+        if tolerance is not None:
+            tolerance = max(.01, tolerance)
+        if self._tolerance != tolerance:
+            self._tolerance = tolerance
+            self._rebuildPath()
+
+    def levelOfDetail(self):
+        return self._lod
+
+    def setLevelOfDetail(self, lod):
+        '''
+        Take the step count from a gui.lod.LevelOfDetail and the size of the
+        curve on screen instead of the precision. A tolerance, if set, still
+        takes precedence.
+        '''
+        if self._lod is not lod:
+            self._lod = lod
+            self._rebuildPath()
+
+    def _screenExtent(self):
+        # diagonal of the control points' bounding box in device pixels
+        points = np.array([(p.x(), p.y()) for p in self._points])
+        return np.hypot(*np.ptp(points, axis=0)) * self._deviceScale()
+
+    def _steps(self):
+        '''
+        Steps of the whole Bezier curve, or of each segment in B-spline mode
+        '''
+        count = len(self._points)
+        if self._mode == self.BSplineMode:
+            if self._lod is not None:
+                return max(1, ceil(self._lod.samples(self._screenExtent()) / (count + 1)))
+            return max(1, round(1 / self._precision))
+        if self._lod is not None:
+            return self._lod.samples(self._screenExtent())
+        return round(count / self._precision)
+
+    def _deviceScale(self):
+        # largest item to device scale over all the views showing the item
+        views = self.scene().views() if self.scene() else []
+        scales = [abs(self.deviceTransform(view.viewportTransform()).determinant()) ** .5
+                  for view in views]
+        return max(scales, default=1.)
+
     def stepRatio(self):
         return int(1 / self._precision)
 
@@ -182,17 +386,43 @@ class BezierItem(QtWidgets.QGraphicsPathItem):
         self.update()
 
     def updatePath(self):
+        self._rebuildOutline()
+        self._rebuildPath()
+
+    def _rebuildOutline(self):
         outlinePath = QtGui.QPainterPath()
         if self.controlItems:
             outlinePath.moveTo(self._points[0])
             for point in self._points[1:]:
                 outlinePath.lineTo(point)
         self.outlineItem.setPath(outlinePath)
-        self._rebuildPath()
 
     def _controlPointMoved(self, index, pos):
-        self._points[index] = pos
-        self.updatePath()
+        old = self._points[index]
+        self._points[index] = QtCore.QPointF(pos)
+
+        outlinePath = self.outlineItem.path()
+        outlinePath.setElementPositionAt(index, pos.x(), pos.y())
+        self.outlineItem.setPath(outlinePath)
+
+        if self._canUpdateSegments():
+            # a B-spline point only shapes the four segments around it
+            self._updateSegments(index - 1, index + 3, index + 3)
+            return
+
+        count = len(self._points)
+        steps = self._steps()
+        if (self._mode != self.BezierMode or self._tolerance is not None
+                or self._samples is None or len(self._samples) != steps + 1
+                or self._incrementalMoves >= self._maxIncrementalMoves):
+            self._rebuildPath()
+            return
+        # the curve is linear in its control points: moving point i shifts
+        # every sample by its Bernstein weight times the displacement
+        weights = bernsteinBasis(count, steps)[:, index]
+        self._samples += np.outer(weights, (pos.x() - old.x(), pos.y() - old.y()))
+        self._incrementalMoves += 1
+        self._setSamples(self._samples)
 
     def _rebuildPath(self):
         '''
@@ -201,28 +431,86 @@ class BezierItem(QtWidgets.QGraphicsPathItem):
         usually enough, lower values result in higher resolution but slower
         performance, and viceversa.
         '''
-        self.curvePath = QtGui.QPainterPath()
+        self._rebuildScheduled = False
+        self._segments = None
+        samples = None
         if self._points:
-            self.curvePath.moveTo(self._points[0])
-            count = len(self._points)
-            steps = round(count / self._precision)
-            precision = 1 / steps
-            n = count - 1
-            # we're going to iterate through points *a lot* of times; with the
-            # small cost of a tuple, we can cache the inner iterator to speed
-            # things up a bit, instead of creating it in each for loop cycle
-            pointIterator = tuple(enumerate(self._points))
-            for s in range(steps + 1):
-                u = precision * s
-                x = y = 0
-                for i, point in pointIterator:
-                    binu = (factorial(n) / (factorial(i) * factorial(n - i))
-                            * (u ** i) * ((1 - u) ** (n - i)))
-                    x += binu * point.x()
-                    y += binu * point.y()
-                self.curvePath.lineTo(x, y)
+            points = np.array([(p.x(), p.y()) for p in self._points])
+            self._sampledSteps = self._steps()
+            if self._mode == self.BSplineMode:
+                if self._tolerance is not None:
+                    self._flattenScale = self._deviceScale()
+                self._segments = self._bsplineSegments(0, len(points) + 1)
+                samples = self._joinSegments()
+            elif self._tolerance is not None:
+                self._flattenScale = self._deviceScale()
+                samples = flattenBezier(points, self._tolerance / self._flattenScale)
+            else:
+                samples = bernsteinBasis(len(points), self._sampledSteps) @ points
+        self._samples = samples
+        self._incrementalMoves = 0
+        self._setSamples(samples)
+
+    def _canUpdateSegments(self):
+        return self._mode == self.BSplineMode and self._segments is not None
+
+    def _paddedPoints(self):
+        # repeat the end points so that the curve starts and ends on them
+        points = np.array([(p.x(), p.y()) for p in self._points])
+        return np.concatenate([points[:1], points[:1], points, points[-1:], points[-1:]])
+
+    def _bsplineSegments(self, start, stop):
+        '''
+        Sample the B-spline segments start .. stop - 1, segment k is shaped
+        by the padded control points k .. k + 3.
+        '''
+        padded = self._paddedPoints()
+        windows = np.lib.stride_tricks.sliding_window_view(padded[start:stop + 3], 4, axis=0)
+        # windows has shape (segments, 2, 4)
+        if self._tolerance is not None:
+            tolerance = self._tolerance / self._flattenScale
+            return [flattenBezier(_bsplineToBezier @ window.T, tolerance) for window in windows]
+        # local updates keep the step count of the last full rebuild
+        basis = cubicBSplineBasis(self._sampledSteps)
+        return list(np.einsum('sj,kdj->ksd', basis, windows))
+
+    def _joinSegments(self):
+        # consecutive segments share their end and start sample
+        return np.concatenate([self._segments[0]] + [segment[1:] for segment in self._segments[1:]])
+
+    def _updateSegments(self, start, stop, oldStop):
+        '''
+        Replace the old segments start .. oldStop - 1 with freshly sampled
+        segments start .. stop - 1 and rebuild the path.
+        '''
+        count = len(self._points) + 1
+        start = max(0, start)
+        stop = min(count, stop)
+        self._segments[start:oldStop] = self._bsplineSegments(start, stop)
+        self._samples = self._joinSegments()
+        self._setSamples(self._samples)
+
+    def _setSamples(self, samples):
+        self.curvePath = QtGui.QPainterPath()
+        if samples is not None:
+            # hand all the samples to the path at once
+            self.curvePath.addPolygon(polygonFromArray(samples))
         self.setPath(self.curvePath)
 
+    def paint(self, qp, option, widget=None):
+        if not self._rebuildScheduled and self._points:
+            # re-sample once the zoom has changed noticeably; the path must
+            # not change while painting, so do it right after
+            if self._tolerance is not None:
+                ratio = self._deviceScale() / self._flattenScale
+                stale = not .8 < ratio < 1.25
+            else:
+                stale = self._lod is not None and self._steps() != self._sampledSteps
+            if stale:
+                self._rebuildScheduled = True
+                QtCore.QTimer.singleShot(0, self._rebuildPath)
+        super().paint(qp, option, widget)
+
 
 class BezierExample(QtWidgets.QWidget):
     def __init__(self):
@@ -246,6 +534,18 @@ class BezierExample(QtWidgets.QWidget):
         resSpin.setValue(self.bezierItem.stepRatio())
         topLayout.addWidget(resSpin)
 
+        modeCombo = QtWidgets.QComboBox()
+        modeCombo.addItems(['Bezier', 'B-spline'])
+        topLayout.addWidget(modeCombo)
+
+        topLayout.addWidget(QtWidgets.QLabel('Tolerance:'))
+        tolSpin = QtWidgets.QDoubleSpinBox(minimum=0, maximum=10, singleStep=.25, suffix=' px')
+        tolSpin.setSpecialValueText('Off')
+        topLayout.addWidget(tolSpin)
+
+        lodCheck = QtWidgets.QCheckBox('Zoom level of detail')
+        topLayout.addWidget(lodCheck)
+
         topLayout.addStretch()
         addButton = QtWidgets.QPushButton('Add point')
         topLayout.addWidget(addButton)
@@ -254,6 +554,10 @@ class BezierExample(QtWidgets.QWidget):
 
         self.bezierView.installEventFilter(self)
         resSpin.valueChanged.connect(self.bezierItem.setStepRatio)
+        modeCombo.currentIndexChanged.connect(self.bezierItem.setMode)
+        lodCheck.toggled.connect(
+            lambda checked: self.bezierItem.setLevelOfDetail(LevelOfDetail() if checked else None))
+        tolSpin.valueChanged.connect(lambda value: self.bezierItem.setTolerance(value or None))
         addButton.clicked.connect(self.addPoint)
 
     def addPoint(self, point=None):
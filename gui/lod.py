@@ -0,0 +1,22 @@
+from math import ceil, log2
+
+
+class LevelOfDetail:
+    """
+    Choose how many samples to evaluate for a curve from its size on screen.
+
+    The count aims at one sample every pixels_per_sample device pixels and is
+    rounded up to a power of two, so a curve is only re-sampled when zooming
+    crosses one of those levels, not on every small zoom step.
+    """
+
+    def __init__(self, pixels_per_sample=4., minimum=16, maximum=4096):
+        self.pixels_per_sample = pixels_per_sample
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def samples(self, extent):
+        """ Sample count for a curve spanning extent device pixels """
+        wanted = max(extent / self.pixels_per_sample, 1.)
+        count = 2 ** ceil(log2(wanted))
+        return int(min(self.maximum, max(self.minimum, count)))
@@ -1,32 +1,99 @@
+import argparse
+import json
+import sys
+
 import numpy as np
-import plotly.graph_objects as go
-from scipy.optimize import differential_evolution
+from optimizer.cache import CachedObjective
+from optimizer.driver import minimize
+from optimizer.functions import FUNCTIONS, get_function
+from optimizer.multistart import multi_start
+from optimizer.trace import traced_minimize
+
+# surface samples per screen pixel of the figure, capped to keep plotly responsive
+PIXELS_PER_SAMPLE = 4
+MAX_SURFACE_SAMPLES = 500
+
+
+def surface_resolution(width, height):
+    """ Number of grid samples per axis for a figure of width x height pixels """
+    return int(np.clip(min(width, height) // PIXELS_PER_SAMPLE, 16, MAX_SURFACE_SAMPLES))
+
+
+def plot(function, result, width, height):
+    # plotly is slow to import, only pay for it when a figure is wanted
+    import plotly.graph_objects as go
+
+    (x_lo, x_hi), (y_lo, y_hi) = function.bounds(2)
+    n = surface_resolution(width, height)
+    X, Y = np.meshgrid(np.linspace(x_lo, x_hi, n), np.linspace(y_lo, y_hi, n))
+    Z = function((X, Y))
+
+    fig = go.Figure(data=[go.Surface(z=Z, x=X, y=Y)])
+
+    # minimum : black dot
+    fig.add_trace(go.Scatter3d(x=[result.x[0]], y=[result.x[1]], z=[result.fun],
+                               mode='markers', marker=dict(size=5, color='black')))
+
+    fig.update_layout(title=f'{function.name.capitalize()} function', width=width, height=height)
+    fig.show()
 
-X = np.linspace(-5.12, 5.12, 500)
-Y = np.linspace(-5.12, 5.12, 500)
-X, Y = np.meshgrid(X, Y)
 
-def rastrigin(p):
-    xx = p[0]
-    yy = p[1]
-    z = (xx ** 2 - 10 * np.cos(2 * np.pi * xx)) + \
-        (yy ** 2 - 10 * np.cos(2 * np.pi * yy)) + 20
-    return z
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the global minimum of a test function")
+    parser.add_argument("--function", default="rastrigin", choices=list(FUNCTIONS))
+    parser.add_argument("--dim", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--restarts", type=int, default=1, help="independent seeded restarts")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the restarts")
+    parser.add_argument("--no-plot", dest="plot", action="store_false", help="skip the surface plot")
+    parser.add_argument("--width", type=int, default=1000, help="figure width in pixels")
+    parser.add_argument("--height", type=int, default=1000, help="figure height in pixels")
+    parser.add_argument("--output", help="write the result as JSON to this file")
+    parser.add_argument("--cache", action="store_true", help="memoize objective evaluations")
+    parser.add_argument("--cache-resolution", type=float, default=None,
+                        help="snap points to this grid step before the cache lookup")
+    parser.add_argument("--cache-file", help="keep cached evaluations in this file between runs")
+    parser.add_argument("--trace", help="write per generation convergence data to this .npz file")
+    args = parser.parse_args(argv)
+    if args.trace and args.restarts > 1:
+        parser.error("--trace records a single run, it cannot be combined with --restarts")
 
+    function = get_function(args.function)
+    bounds = function.bounds(args.dim)
+    objective = function
+    if args.cache or args.cache_file:
+        objective = CachedObjective(function, resolution=args.cache_resolution, path=args.cache_file)
 
-Z = rastrigin((X, Y))
+    # find minimum
+    if args.restarts > 1:
+        result = multi_start(objective, bounds, n_starts=args.restarts,
+                             seed=args.seed, workers=args.workers)
+    elif args.trace:
+        result, tracer = traced_minimize(objective, bounds, path=args.trace, rng=args.seed)
+        print("trace:", tracer.summary(), file=sys.stderr)
+    else:
+        result = minimize(objective, bounds, rng=args.seed)
+    print(result.x, result.fun)
 
-# find minimum
-bounds = [(-5.12, 5.12), (-5.12, 5.12)]
-result = differential_evolution(rastrigin, bounds)
-print(result.x, result.fun)
+    if objective is not function:
+        # worker processes use their own copy, only in-process restarts show up here
+        print("cache:", objective.stats(), file=sys.stderr)
+        objective.close()
 
-fig = go.Figure(data=[go.Surface(z=Z, x=X, y=Y)])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"function": function.name,
+                       "dim": args.dim,
+                       "x": result.x.tolist(),
+                       "fun": float(result.fun),
+                       "nfev": int(result.nfev)}, f, indent=2)
 
-# minimum : black dot
-fig.add_trace(go.Scatter3d(x=[result.x[0]], y=[result.x[1]], z=[result.fun],
-                           mode='markers', marker=dict(size=5, color='black')))
+    if args.plot:
+        if args.dim != 2:
+            print("surface plot needs --dim 2", file=sys.stderr)
+        else:
+            plot(function, result, args.width, args.height)
 
-fig.update_layout(title='Rastrigin function', width=1000, height=1000)
-fig.show()
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Ask/tell differential evolution for slow or external objectives.
+
+The optimizer never calls the objective itself: ask() hands out a generation
+of candidates, tell() takes their scores back in the same order. run() and
+run_async() drive the loop and evaluate a whole generation concurrently.
+
+    optimizer = DifferentialEvolution(bounds, rng=1)
+    with ProcessPoolExecutor() as pool:
+        result = run(optimizer, objective, executor=pool)
+"""
+
+import asyncio
+from concurrent.futures import as_completed
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+STRATEGIES = ("best1bin", "rand1bin")
+
+
+class DifferentialEvolution:
+    def __init__(self, bounds, popsize=15, mutation=(0.5, 1), recombination=0.7,
+                 strategy="best1bin", rng=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}")
+        self.lower, self.upper = np.asarray(bounds, dtype=float).T
+        self.dim = len(self.lower)
+        self.size = max(5, popsize * self.dim)
+        self.mutation = mutation
+        self.recombination = recombination
+        self.strategy = strategy
+        self.rng = np.random.default_rng(rng)
+
+        self.population = None  # members in the unit cube
+        self.energies = None
+        self.nit = 0
+        self.nfev = 0
+        self._trials = None
+
+    def _scale(self, unit):
+        return self.lower + unit * (self.upper - self.lower)
+
+    def _latin_hypercube(self):
+        segments = (np.arange(self.size)[:, None] + self.rng.random((self.size, self.dim))) / self.size
+        for column in segments.T:
+            self.rng.shuffle(column)
+        return segments
+
+    def _mutate(self):
+        if np.ndim(self.mutation):
+            scale = self.rng.uniform(*self.mutation)  # dither once per generation
+        else:
+            scale = self.mutation
+        n = self.size
+        # three distinct partners per member, none of them the member itself
+        picks = np.argsort(self.rng.random((n, n)) + np.eye(n), axis=1)[:, :3]
+        r0, r1, r2 = picks.T
+        base = self.population[np.argmin(self.energies)] if self.strategy == "best1bin" else self.population[r0]
+        mutant = base + scale * (self.population[r1] - self.population[r2])
+
+        cross = self.rng.random((n, self.dim)) < self.recombination
+        cross[np.arange(n), self.rng.integers(self.dim, size=n)] = True
+        trials = np.where(cross, mutant, self.population)
+        # members that left the unit cube are re-drawn at random, as scipy does
+        outside = (trials < 0) | (trials > 1)
+        trials[outside] = self.rng.random(np.count_nonzero(outside))
+        return trials
+
+    def ask(self):
+        """ Candidates to evaluate next, shape (size, dim) """
+        if self._trials is None:
+            self._trials = self._latin_hypercube() if self.population is None else self._mutate()
+        return self._scale(self._trials)
+
+    def tell(self, values):
+        """ Scores of the candidates from the last ask(), in the same order """
+        if self._trials is None:
+            raise RuntimeError("tell() called without a preceding ask()")
+        values = np.asarray(values, dtype=float)
+        if values.shape != (self.size,):
+            raise ValueError(f"expected {self.size} values, got shape {values.shape}")
+        values = np.where(np.isnan(values), np.inf, values)
+        self.nfev += self.size
+
+        if self.population is None:
+            self.population, self.energies = self._trials, values
+        else:
+            better = values <= self.energies
+            self.population[better] = self._trials[better]
+            self.energies[better] = values[better]
+            self.nit += 1
+        self._trials = None
+
+    def converged(self, tol=0.01, atol=0.0):
+        # same criterion as scipy's differential_evolution
+        if self.energies is None or not np.all(np.isfinite(self.energies)):
+            return False
+        return np.std(self.energies) <= atol + tol * np.abs(np.mean(self.energies))
+
+    def result(self):
+        best = np.argmin(self.energies)
+        return OptimizeResult(x=self._scale(self.population[best]),
+                              fun=self.energies[best],
+                              nit=self.nit,
+                              nfev=self.nfev,
+                              success=self.converged())
+
+
+def run(optimizer, func, executor=None, maxiter=1000, tol=0.01):
+    """
+    Drive optimizer with func evaluated on a concurrent.futures executor.
+    Scores are collected in completion order, slow candidates do not hold
+    up the others. Without an executor the candidates run in turn.
+    """
+    for _ in range(maxiter + 1):
+        candidates = optimizer.ask()
+        if executor is None:
+            values = [func(c) for c in candidates]
+        else:
+            futures = {executor.submit(func, c): i for i, c in enumerate(candidates)}
+            values = np.empty(len(candidates))
+            for future in as_completed(futures):
+                values[futures[future]] = future.result()
+        optimizer.tell(values)
+        if optimizer.converged(tol):
+            break
+    return optimizer.result()
+
+
+async def run_async(optimizer, func, maxiter=1000, tol=0.01, concurrency=None):
+    """
+    Drive optimizer with a coroutine function, e.g. one that awaits an
+    external process. concurrency limits the evaluations in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def evaluate(candidate):
+        if semaphore is None:
+            return await func(candidate)
+        async with semaphore:
+            return await func(candidate)
+
+    for _ in range(maxiter + 1):
+        candidates = optimizer.ask()
+        optimizer.tell(await asyncio.gather(*(evaluate(c) for c in candidates)))
+        if optimizer.converged(tol):
+            break
+    return optimizer.result()
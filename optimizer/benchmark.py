@@ -0,0 +1,122 @@
+"""
+Benchmark differential evolution settings on the registered test functions.
+
+    python -m optimizer.benchmark --functions rastrigin ackley --dims 2 10 \
+        --popsizes 15 30 --strategies best1bin rand1bin --csv bench.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from optimizer.driver import minimize, wrap_objective
+from optimizer.functions import FUNCTIONS, get_function
+
+COLUMNS = ["function", "dim", "popsize", "strategy", "repeats",
+           "evals_per_sec", "mean_time", "mean_nfev", "time_to_target",
+           "success_rate", "mean_fun"]
+
+
+class _Recorder:
+    """ Counts evaluations and notes when the target value is first reached """
+
+    def __init__(self, func, target):
+        wrap_objective(self, func)
+        self.func = func
+        self.target = target
+        self.nfev = 0
+        self.hit_time = None
+        self.start = perf_counter()
+
+    def __call__(self, x):
+        f = self.func(x)
+        self.nfev += np.size(f)
+        if self.hit_time is None and np.min(f) <= self.target:
+            self.hit_time = perf_counter() - self.start
+        return f
+
+
+def run_case(function, dim, popsize, strategy, repeats=5, tol=1e-4, seed=None, **kwargs):
+    """
+    Optimize function repeats times with one setting and aggregate the runs.
+    A run is a success if it ends within tol of the known minimum.
+    """
+    target = function.minimum(dim) + tol
+    seeds = np.random.SeedSequence(seed).spawn(repeats)
+    times, nfevs, funs, hits = [], [], [], []
+    for s in seeds:
+        recorder = _Recorder(function, target)
+        result = minimize(recorder, function.bounds(dim), popsize=popsize,
+                          strategy=strategy, rng=np.random.default_rng(s), **kwargs)
+        times.append(perf_counter() - recorder.start)
+        nfevs.append(recorder.nfev)
+        funs.append(result.fun)
+        if result.fun <= target:
+            hits.append(recorder.hit_time)
+
+    return {"function": function.name,
+            "dim": dim,
+            "popsize": popsize,
+            "strategy": strategy,
+            "repeats": repeats,
+            "evals_per_sec": sum(nfevs) / sum(times),
+            "mean_time": float(np.mean(times)),
+            "mean_nfev": float(np.mean(nfevs)),
+            # median over the successful runs only
+            "time_to_target": float(np.median(hits)) if hits else None,
+            "success_rate": len(hits) / repeats,
+            "mean_fun": float(np.mean(funs))}
+
+
+def run_benchmark(functions, dims, popsizes, strategies, repeats=5, tol=1e-4, seed=None, **kwargs):
+    rows = []
+    for name, dim, popsize, strategy in itertools.product(functions, dims, popsizes, strategies):
+        rows.append(run_case(get_function(name), dim, popsize, strategy,
+                             repeats=repeats, tol=tol, seed=seed, **kwargs))
+    return rows
+
+
+def write_csv(rows, file):
+    writer = csv.DictWriter(file, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_json(rows, file):
+    json.dump(rows, file, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--functions", nargs="+", default=["rastrigin"], choices=list(FUNCTIONS))
+    parser.add_argument("--dims", nargs="+", type=int, default=[2, 5, 10])
+    parser.add_argument("--popsizes", nargs="+", type=int, default=[15])
+    parser.add_argument("--strategies", nargs="+", default=["best1bin"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--maxiter", type=int, default=1000)
+    parser.add_argument("--tol", type=float, default=1e-4, help="success distance from the known minimum")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--csv", help="write the results as CSV to this file ('-' for stdout)")
+    parser.add_argument("--json", help="write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    rows = run_benchmark(args.functions, args.dims, args.popsizes, args.strategies,
+                         repeats=args.repeats, tol=args.tol, seed=args.seed, maxiter=args.maxiter)
+
+    for path, write in ((args.csv, write_csv), (args.json, write_json)):
+        if path == "-":
+            write(rows, sys.stdout)
+        elif path:
+            with open(path, "w", newline="") as f:
+                write(rows, f)
+    if not (args.csv or args.json):
+        write_csv(rows, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import shelve
+from collections import OrderedDict
+from time import perf_counter
+
+import numpy as np
+
+from optimizer.driver import wrap_objective
+
+
+class CachedObjective:
+    """
+    Memoize an objective on (quantized) points.
+
+    resolution: points are snapped to a grid of this step before lookup, so
+        nearly identical points share one entry. None keys on the exact value.
+    maxsize: number of entries kept in memory, least recently used are
+        evicted first. An entry takes roughly 8 * dim + 150 bytes.
+    path: optional shelve file that keeps every evaluation between runs.
+        The disk store is per process: a pickled copy (e.g. sent to a
+        multi_start worker) only keeps the in-memory cache.
+
+    The wrapper is vectorized, and has derivatives, if the wrapped objective does.
+    """
+
+    def __init__(self, func, resolution=None, maxsize=100_000, path=None):
+        self.func = func
+        wrap_objective(self, func)
+        self.resolution = resolution
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.eval_time = 0.0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_db"] = None
+        state["path"] = None
+        return state
+
+    def _key(self, point):
+        if self.resolution is not None:
+            point = np.round(point / self.resolution)
+        # + 0.0 folds -0.0 into 0.0 so both get the same key
+        return (np.ascontiguousarray(point, dtype=float) + 0.0).tobytes()
+
+    def _store(self):
+        if self._db is None and self.path is not None:
+            self._db = shelve.open(self.path)
+        return self._db
+
+    def _lookup(self, key):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        db = self._store()
+        if db is not None:
+            value = db.get(key.hex())
+            if value is not None:
+                self._remember(key, value)
+            return value
+        return None
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _evaluate(self, points):
+        """ Evaluate the columns of points with the wrapped objective """
+        start = perf_counter()
+        if self.vectorized:
+            values = np.asarray(self.func(points), dtype=float)
+        else:
+            values = np.array([self.func(p) for p in points.T], dtype=float)
+        self.eval_time += perf_counter() - start
+        self.misses += points.shape[1]
+        return values
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=float)
+        points = x.reshape(x.shape[0], -1)
+        keys = [self._key(p) for p in points.T]
+        values = np.empty(len(keys))
+        missing = []
+        for i, key in enumerate(keys):
+            value = self._lookup(key)
+            if value is None:
+                missing.append(i)
+            else:
+                values[i] = value
+                self.hits += 1
+
+        if missing:
+            values[missing] = self._evaluate(points[:, missing])
+            db = self._store()
+            for i in missing:
+                self._remember(keys[i], float(values[i]))
+                if db is not None:
+                    db[keys[i].hex()] = float(values[i])
+
+        return values[0] if x.ndim == 1 else values.reshape(x.shape[1:])
+
+    def stats(self):
+        calls = self.hits + self.misses
+        mean_time = self.eval_time / self.misses if self.misses else 0.0
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / calls if calls else 0.0,
+                "eval_time": self.eval_time,
+                "time_saved": self.hits * mean_time,
+                "size": len(self._memory)}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
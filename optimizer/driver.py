@@ -0,0 +1,61 @@
+from scipy import optimize
+from scipy.optimize import differential_evolution
+
+
+def vectorized(func):
+    """
+    Mark an objective as population-vectorized: it accepts an array of
+    shape (N, S) holding S candidates and returns their S values.
+    """
+    func.vectorized = True
+    return func
+
+
+def is_vectorized(func):
+    return getattr(func, "vectorized", False)
+
+
+def wrap_objective(wrapper, func):
+    """
+    Give wrapper the capabilities advertised by func: vectorized
+    evaluation and analytic derivatives.
+    """
+    wrapper.vectorized = is_vectorized(func)
+    for name in ("gradient", "hessian"):
+        if getattr(func, name, None) is not None:
+            setattr(wrapper, name, getattr(func, name))
+    return wrapper
+
+
+def analytic_polish(func):
+    """
+    Polishing step for differential_evolution that uses the analytic
+    func.gradient, and func.hessian if there is one, instead of finite
+    differences.
+    """
+    hessian = getattr(func, "hessian", None)
+
+    def polish(f, x0, bounds=None, constraints=()):
+        if hessian is not None and not constraints:
+            return optimize.minimize(f, x0, jac=func.gradient, hess=hessian,
+                                     bounds=bounds, method="trust-constr")
+        return optimize.minimize(f, x0, jac=func.gradient, bounds=bounds,
+                                 constraints=constraints,
+                                 method="trust-constr" if constraints else "L-BFGS-B")
+
+    return polish
+
+
+def minimize(func, bounds, **kwargs):
+    """
+    Run differential_evolution on func. Objectives marked with @vectorized
+    get a whole generation per call instead of one candidate per call, and
+    objectives with a gradient attribute are polished with it.
+    """
+    if getattr(func, "gradient", None) is not None and kwargs.get("polish", True) is True:
+        kwargs["polish"] = analytic_polish(func)
+    if is_vectorized(func) and kwargs.get("workers", 1) == 1:
+        kwargs.setdefault("vectorized", True)
+        # scipy forces this for vectorized runs, be explicit about it
+        kwargs.setdefault("updating", "deferred")
+    return differential_evolution(func, bounds, **kwargs)
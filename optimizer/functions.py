@@ -0,0 +1,178 @@
+"""
+Standard N-dimensional test functions for global optimization.
+
+Every function takes x with the dimension along axis 0, so a single point
+of shape (N,) gives a scalar and a population of shape (N, S) gives S
+values in one vectorized call. Gradients follow the same convention and
+return an array shaped like x. Hessians take a single point and return
+an (N, N) matrix.
+"""
+
+import numpy as np
+from scipy.optimize import rosen_hess
+
+
+class TestFunction:
+    vectorized = True
+
+    def __init__(self, name, func, lower, upper, argmin=0.0, gradient=None, hessian=None):
+        self.name = name
+        self.func = func
+        self.lower = lower
+        self.upper = upper
+        # per coordinate location of the global minimum
+        self._argmin = argmin
+        self._gradient = gradient
+        self._hessian = hessian
+        # only advertise the derivatives that exist, see optimizer.driver
+        if gradient is not None:
+            self.gradient = self._evaluate_gradient
+        if hessian is not None:
+            self.hessian = self._evaluate_hessian
+
+    def __call__(self, x):
+        return self.func(np.asarray(x, dtype=float))
+
+    def _evaluate_gradient(self, x):
+        return self._gradient(np.asarray(x, dtype=float))
+
+    def _evaluate_hessian(self, x):
+        return self._hessian(np.asarray(x, dtype=float))
+
+    def __repr__(self):
+        return f"TestFunction({self.name}, [{self.lower}, {self.upper}])"
+
+    def bounds(self, dim):
+        return [(self.lower, self.upper)] * dim
+
+    def argmin(self, dim):
+        return np.full(dim, self._argmin)
+
+    def minimum(self, dim):
+        """ Known global minimum value in dim dimensions """
+        return float(self(self.argmin(dim)))
+
+
+def _index(x):
+    # 1-based coordinate index, broadcastable against x
+    return np.arange(1, x.shape[0] + 1).reshape((-1,) + (1,) * (x.ndim - 1))
+
+
+def _leave_one_out_prod(x):
+    # product over all coordinates but the i-th, without dividing by x[i]
+    ones = np.ones_like(x[:1])
+    before = np.cumprod(np.concatenate([ones, x[:-1]]), axis=0)
+    after = np.cumprod(np.concatenate([ones, x[:0:-1]]), axis=0)[::-1]
+    return before * after
+
+
+def _sphere(x):
+    return np.sum(x ** 2, axis=0)
+
+
+def _sphere_gradient(x):
+    return 2 * x
+
+
+def _sphere_hessian(x):
+    return 2 * np.eye(len(x))
+
+
+def _rastrigin(x):
+    return 10 * x.shape[0] + np.sum(x ** 2 - 10 * np.cos(2 * np.pi * x), axis=0)
+
+
+def _rastrigin_gradient(x):
+    return 2 * x + 20 * np.pi * np.sin(2 * np.pi * x)
+
+
+def _rastrigin_hessian(x):
+    return np.diag(2 + 40 * np.pi ** 2 * np.cos(2 * np.pi * x))
+
+
+def _ackley(x):
+    n = x.shape[0]
+    return (-20 * np.exp(-0.2 * np.sqrt(np.sum(x ** 2, axis=0) / n))
+            - np.exp(np.sum(np.cos(2 * np.pi * x), axis=0) / n)
+            + 20 + np.e)
+
+
+def _ackley_gradient(x):
+    n = x.shape[0]
+    r = np.sqrt(np.sum(x ** 2, axis=0) / n)
+    # the cone at the origin has no gradient, use 0 there
+    radial = np.divide(4 * np.exp(-0.2 * r), n * r, out=np.zeros_like(r), where=r > 0)
+    periodic = 2 * np.pi / n * np.exp(np.sum(np.cos(2 * np.pi * x), axis=0) / n)
+    return radial * x + periodic * np.sin(2 * np.pi * x)
+
+
+def _rosenbrock(x):
+    return np.sum(100 * (x[1:] - x[:-1] ** 2) ** 2 + (1 - x[:-1]) ** 2, axis=0)
+
+
+def _rosenbrock_gradient(x):
+    step = x[1:] - x[:-1] ** 2
+    grad = np.zeros_like(x)
+    grad[:-1] = -400 * x[:-1] * step - 2 * (1 - x[:-1])
+    grad[1:] += 200 * step
+    return grad
+
+
+def _griewank(x):
+    return (np.sum(x ** 2, axis=0) / 4000
+            - np.prod(np.cos(x / np.sqrt(_index(x))), axis=0) + 1)
+
+
+def _griewank_gradient(x):
+    root = np.sqrt(_index(x))
+    return x / 2000 + np.sin(x / root) / root * _leave_one_out_prod(np.cos(x / root))
+
+
+def _schwefel(x):
+    return 418.9828872724339 * x.shape[0] - np.sum(x * np.sin(np.sqrt(np.abs(x))), axis=0)
+
+
+def _schwefel_gradient(x):
+    s = np.sqrt(np.abs(x))
+    return -(np.sin(s) + s * np.cos(s) / 2)
+
+
+def _styblinski_tang(x):
+    return np.sum(x ** 4 - 16 * x ** 2 + 5 * x, axis=0) / 2
+
+
+def _styblinski_tang_gradient(x):
+    return (4 * x ** 3 - 32 * x + 5) / 2
+
+
+def _styblinski_tang_hessian(x):
+    return np.diag(6 * x ** 2 - 16)
+
+
+sphere = TestFunction("sphere", _sphere, -5.12, 5.12,
+                      gradient=_sphere_gradient, hessian=_sphere_hessian)
+rastrigin = TestFunction("rastrigin", _rastrigin, -5.12, 5.12,
+                         gradient=_rastrigin_gradient, hessian=_rastrigin_hessian)
+ackley = TestFunction("ackley", _ackley, -32.768, 32.768,
+                      gradient=_ackley_gradient)
+rosenbrock = TestFunction("rosenbrock", _rosenbrock, -5.0, 10.0, argmin=1.0,
+                          gradient=_rosenbrock_gradient, hessian=rosen_hess)
+griewank = TestFunction("griewank", _griewank, -600.0, 600.0,
+                        gradient=_griewank_gradient)
+schwefel = TestFunction("schwefel", _schwefel, -500.0, 500.0, argmin=420.9687462275036,
+                        gradient=_schwefel_gradient)
+styblinski_tang = TestFunction("styblinski_tang", _styblinski_tang, -5.0, 5.0,
+                               argmin=-2.903534027771178,
+                               gradient=_styblinski_tang_gradient, hessian=_styblinski_tang_hessian)
+
+FUNCTIONS = {f.name: f for f in (sphere, rastrigin, ackley, rosenbrock,
+                                 griewank, schwefel, styblinski_tang)}
+
+
+def get_function(name):
+    try:
+        return FUNCTIONS[name]
+    except KeyError:
+        raise ValueError(f"unknown test function {name!r}, "
+                         f"choose from {', '.join(FUNCTIONS)}") from None
+
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+from optimizer.driver import minimize
+
+
+def _restart(task):
+    func, bounds, seed, kwargs = task
+    return minimize(func, bounds, rng=np.random.default_rng(seed), **kwargs)
+
+
+def multi_start(func, bounds, n_starts=8, seed=None, workers=None, **kwargs):
+    """
+    Run n_starts independent differential evolution searches and keep the best.
+
+    Every restart gets its own child of np.random.SeedSequence(seed), so the
+    result for a given master seed does not depend on the number of workers.
+    workers=None uses all cores, workers=1 runs the restarts in-process.
+    func must be picklable (defined at module level) when workers != 1.
+    Remaining keyword arguments go to differential_evolution.
+    """
+    if "rng" in kwargs or "seed" in kwargs:
+        raise ValueError("multi_start derives the restart seeds from 'seed'")
+    seeds = np.random.SeedSequence(seed).spawn(n_starts)
+    tasks = [(func, bounds, s, kwargs) for s in seeds]
+
+    if workers == 1:
+        results = [_restart(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map keeps the restart order, whichever worker finishes first
+            results = list(pool.map(_restart, tasks))
+
+    best_index = min(range(n_starts), key=lambda i: results[i].fun)
+    best = results[best_index]
+    return OptimizeResult(x=best.x,
+                          fun=best.fun,
+                          success=best.success,
+                          best_index=best_index,
+                          nfev=sum(r.nfev for r in results),
+                          results=results)
@@ -0,0 +1,119 @@
+"""
+Evaluate a 2-D objective landscape on very large grids with bounded memory.
+
+The grid is computed tile by tile into a memory-mapped .npy file, so RAM use
+depends on the tile size and the number of workers, not on the grid size.
+
+    python -m optimizer.surface --function rastrigin --size 20000 --output surface.npy --pyramid
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from optimizer.functions import FUNCTIONS, get_function
+
+
+def _tiles(shape, tile):
+    rows, cols = shape
+    for r0 in range(0, rows, tile):
+        for c0 in range(0, cols, tile):
+            yield r0, min(r0 + tile, rows), c0, min(c0 + tile, cols)
+
+
+def _axis(lim, n, start, stop):
+    # same sample positions as np.linspace(*lim, n)[start:stop], without the full axis
+    lo, hi = lim
+    return lo + (hi - lo) * np.arange(start, stop) / max(n - 1, 1)
+
+
+def _evaluate_tile(task):
+    func, xlim, ylim, path, (r0, r1, c0, c1) = task
+    out = np.load(path, mmap_mode="r+")
+    rows, cols = out.shape
+    X, Y = np.meshgrid(_axis(xlim, cols, c0, c1), _axis(ylim, rows, r0, r1))
+    out[r0:r1, c0:c1] = func((X, Y))
+    out.flush()
+
+
+def evaluate_surface(func, xlim, ylim, shape, path, dtype=np.float32, tile=1024, workers=None):
+    """
+    Evaluate func((X, Y)) on a grid of shape (rows, cols) spanning xlim and
+    ylim and store it in the .npy file path. Tiles run on a process pool,
+    workers=1 runs them in-process. Returns the result as a read-only memmap.
+    """
+    np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape).flush()
+    tasks = [(func, xlim, ylim, path, t) for t in _tiles(shape, tile)]
+    if workers == 1:
+        for task in tasks:
+            _evaluate_tile(task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_evaluate_tile, tasks):
+                pass
+    return np.load(path, mmap_mode="r")
+
+
+def downsample(source, path, factor=2, band=1024):
+    """
+    Block-average source by factor into the .npy file path, band rows at a
+    time. Trailing rows and columns that do not fill a block are dropped.
+    """
+    rows, cols = source.shape[0] // factor, source.shape[1] // factor
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=source.dtype, shape=(rows, cols))
+    step = max(band // factor, 1)
+    for r0 in range(0, rows, step):
+        r1 = min(r0 + step, rows)
+        block = np.asarray(source[r0 * factor:r1 * factor, :cols * factor], dtype=float)
+        out[r0:r1] = block.reshape(r1 - r0, factor, cols, factor).mean(axis=(1, 3))
+    out.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def build_pyramid(path, min_size=256, factor=2):
+    """
+    Downsample the surface in path until its smaller side drops below
+    min_size. Level k is stored next to it as <name>_level<k>.npy; the
+    returned list starts with the full resolution surface.
+    """
+    levels = [np.load(path, mmap_mode="r")]
+    stem, ext = os.path.splitext(path)
+    while min(levels[-1].shape) // factor >= min_size:
+        levels.append(downsample(levels[-1], f"{stem}_level{len(levels)}{ext}", factor))
+    return levels
+
+
+def pyramid_level(levels, max_samples):
+    """ Finest level with at most max_samples per side, for plotting """
+    for level in levels:
+        if max(level.shape) <= max_samples:
+            return level
+    return levels[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--function", default="rastrigin", choices=list(FUNCTIONS))
+    parser.add_argument("--size", type=int, default=4096, help="samples per axis")
+    parser.add_argument("--output", default="surface.npy")
+    parser.add_argument("--float64", dest="dtype", action="store_const", const=np.float64,
+                        default=np.float32, help="store float64 instead of float32")
+    parser.add_argument("--tile", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pyramid", action="store_true", help="also write downsampled levels")
+    args = parser.parse_args(argv)
+
+    function = get_function(args.function)
+    xlim, ylim = function.bounds(2)
+    surface = evaluate_surface(function, xlim, ylim, (args.size, args.size), args.output,
+                               dtype=args.dtype, tile=args.tile, workers=args.workers)
+    print(args.output, surface.shape, surface.dtype)
+    if args.pyramid:
+        for level in build_pyramid(args.output)[1:]:
+            print(level.filename, level.shape)
+
+
+if __name__ == "__main__":
+    main()
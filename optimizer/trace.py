@@ -0,0 +1,74 @@
+from time import perf_counter
+
+import numpy as np
+
+from optimizer.driver import minimize, wrap_objective
+
+COLUMNS = ("generation", "best", "mean", "spread", "nfev", "wall_time")
+
+
+class Tracer:
+    """
+    Wrap an objective to time it and count evaluations, and record one row
+    of convergence statistics per generation via callback().
+
+        tracer = Tracer(func)
+        result = minimize(tracer, bounds, callback=tracer.callback)
+        tracer.finish()
+        tracer.save("run.npz")
+    """
+
+    def __init__(self, func):
+        self.func = func
+        wrap_objective(self, func)
+        self.nfev = 0
+        self.objective_time = 0.0
+        self.wall_time = 0.0
+        self.columns = {name: [] for name in COLUMNS}
+        self._start = perf_counter()
+
+    def __call__(self, x):
+        start = perf_counter()
+        f = self.func(x)
+        self.objective_time += perf_counter() - start
+        self.nfev += np.size(f)
+        return f
+
+    def callback(self, intermediate_result):
+        # differential_evolution passes the current population with its energies
+        energies = intermediate_result.population_energies
+        row = (len(self.columns["generation"]),
+               np.min(energies),
+               np.mean(energies),
+               np.mean(np.std(intermediate_result.population, axis=0)),
+               self.nfev,
+               perf_counter() - self._start)
+        for name, value in zip(COLUMNS, row):
+            self.columns[name].append(value)
+
+    def finish(self):
+        self.wall_time = perf_counter() - self._start
+
+    def summary(self):
+        return {"generations": len(self.columns["generation"]),
+                "nfev": self.nfev,
+                "wall_time": self.wall_time,
+                "objective_time": self.objective_time,
+                "optimizer_time": self.wall_time - self.objective_time,
+                "evals_per_sec": self.nfev / self.wall_time if self.wall_time else 0.0}
+
+    def save(self, path):
+        """ Write the per generation columns and the run summary to a compressed .npz """
+        arrays = {name: np.asarray(values) for name, values in self.columns.items()}
+        arrays.update({f"run_{key}": np.asarray(value) for key, value in self.summary().items()})
+        np.savez_compressed(path, **arrays)
+
+
+def traced_minimize(func, bounds, path=None, **kwargs):
+    """ minimize() with a Tracer attached, returns the result and the tracer """
+    tracer = Tracer(func)
+    result = minimize(tracer, bounds, callback=tracer.callback, **kwargs)
+    tracer.finish()
+    if path is not None:
+        tracer.save(path)
+    return result, tracer
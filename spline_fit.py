@@ -2,6 +2,8 @@ import numpy as np
 from scipy.interpolate import splrep, splev, CubicSpline
 import matplotlib.pyplot as plt
 
+from splines.streaming import StreamingPeriodicSpline
+
 
 x = np.arange(0, 10*np.pi, 1.5)
 y = np.sin(x)
@@ -9,6 +11,9 @@ y[-1] = y[0]  # to make the curve close
 x[-1] = 10.0*np.pi  # to make the curve close
 cs = CubicSpline(x, y, bc_type='periodic')
 spl = splrep(x, y, per=True, k=3)
+# least squares with fewer knots than samples, fitted chunk by chunk
+lsq = StreamingPeriodicSpline(n_knots=15, period=10.0*np.pi)
+lsq.fit([(x[:-1], y[:-1])])
 
 xs = np.arange(-1, 50, 0.1)
 
@@ -19,6 +24,7 @@ ax.plot(x, y, 'o', label='data')
 ax.plot(xs, np.sin(xs), label='sin', linestyle='--', alpha=0.5)
 ax.plot(xs, cs(xs), label='spline')
 ax.plot(xs, splev(xs, spl), label='spline 2')
+ax.plot(xs, lsq(xs), label='lsq spline')
 
 
 ax.set_xlim(-1, 50)
@@ -0,0 +1,48 @@
+"""
+Arc-length lookup for parametric splines from splprep, so points at a given
+distance along the curve need one interpolation and one splev call instead
+of a root search.
+"""
+
+import numpy as np
+from scipy.interpolate import splev
+
+# 5-point Gauss-Legendre rule on [0, 1]
+_nodes, _weights = np.polynomial.legendre.leggauss(5)
+_nodes = (_nodes + 1) / 2
+_weights = _weights / 2
+
+
+class ArcLengthTable:
+    """
+    Cumulative arc length of the spline tck at samples + 1 parameter values.
+    Distances are mapped back to the parameter by linear interpolation in
+    the table, more samples give a more accurate inverse.
+    """
+
+    def __init__(self, tck, samples=1024):
+        self.tck = tck
+        t, c, k = tck
+        self.u = np.linspace(t[k], t[len(t) - k - 1], samples + 1)
+        # integrate the speed |C'(u)| over each table interval
+        du = np.diff(self.u)
+        nodes = self.u[:-1, None] + du[:, None] * _nodes
+        derivative = np.array(splev(nodes.ravel(), tck, der=1))
+        speed = np.sqrt(np.sum(derivative ** 2, axis=0)).reshape(nodes.shape)
+        self.distance = np.concatenate([[0.0], np.cumsum(du * (speed @ _weights))])
+
+    @property
+    def length(self):
+        return self.distance[-1]
+
+    def u_at(self, distance):
+        """ Spline parameter at the given distance(s) from the start """
+        return np.interp(distance, self.distance, self.u)
+
+    def points_at(self, distance):
+        """ Points at the given distances from the start, shape (n, d) """
+        return np.column_stack(splev(np.atleast_1d(self.u_at(distance)), self.tck))
+
+    def evenly_spaced(self, n):
+        """ n points spaced evenly along the curve, both ends included """
+        return self.points_at(np.linspace(0, self.length, n))
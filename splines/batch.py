@@ -0,0 +1,101 @@
+"""
+Fit parametric splines to many point sets (e.g. all contours of an image)
+on a process pool, with the results packed into flat arrays.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+from scipy.interpolate import splprep
+
+
+class BatchFit:
+    """
+    Packed splprep results of a batch. The knots of fit i are
+    knots[knot_offsets[i]:knot_offsets[i + 1]], its coefficients (one column
+    per coordinate) are coefficients[coefficient_offsets[i]:coefficient_offsets[i + 1]].
+    Failed fits have degree -1 and no knots, their messages are in errors.
+    """
+
+    def __init__(self, knots, knot_offsets, coefficients, coefficient_offsets, degree, errors, timing):
+        self.knots = knots
+        self.knot_offsets = knot_offsets
+        self.coefficients = coefficients
+        self.coefficient_offsets = coefficient_offsets
+        self.degree = degree
+        self.errors = errors
+        self.timing = timing
+
+    def __len__(self):
+        return len(self.degree)
+
+    def __repr__(self):
+        return f"BatchFit({len(self)} fits, {len(self.errors)} errors, {self.timing['total']:.3f}s)"
+
+    def tck(self, i):
+        """ The (t, c, k) tuple of fit i, as accepted by splev """
+        if self.degree[i] < 0:
+            raise ValueError(f"fit {i} failed: {dict(self.errors)[i]}")
+        t = self.knots[self.knot_offsets[i]:self.knot_offsets[i + 1]]
+        c = self.coefficients[self.coefficient_offsets[i]:self.coefficient_offsets[i + 1]]
+        return t, list(c.T), int(self.degree[i])
+
+
+def _fit_chunk(task):
+    """ Fit one chunk of point sets and return its results already packed """
+    start, point_sets, k, s, per = task
+    began = perf_counter()
+    knots, coefficients, degree, errors = [], [], [], []
+    for i, points in enumerate(point_sets, start):
+        try:
+            (t, c, deg), _ = splprep(np.asarray(points, dtype=float).T, k=k, s=s, per=per)
+        except Exception as e:
+            knots.append(np.empty(0))
+            coefficients.append(np.empty((0, np.shape(points)[-1])))
+            degree.append(-1)
+            errors.append((i, str(e) or type(e).__name__))
+        else:
+            knots.append(t)
+            coefficients.append(np.column_stack(c))
+            degree.append(deg)
+    return knots, coefficients, degree, errors, perf_counter() - began
+
+
+def _offsets(arrays):
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    return offsets
+
+
+def fit_splines(point_sets, k=3, s=0, per=False, workers=None, chunksize=256):
+    """
+    Fit a splprep spline to every (n_i, d) array in point_sets, all with the
+    same dimension d. The point sets are split into chunks of chunksize and
+    fitted on a process pool; workers=1 fits them in-process.
+    """
+    began = perf_counter()
+    point_sets = list(point_sets)
+    tasks = [(i, point_sets[i:i + chunksize], k, s, per)
+             for i in range(0, len(point_sets), chunksize)]
+    if workers == 1:
+        chunks = [_fit_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_fit_chunk, tasks))
+
+    knots = [t for chunk in chunks for t in chunk[0]]
+    coefficients = [c for chunk in chunks for c in chunk[1]]
+    dim = np.shape(point_sets[0])[-1] if point_sets else 2
+    timing = {"total": 0.0,
+              "fit": sum(chunk[4] for chunk in chunks),
+              "chunks": [chunk[4] for chunk in chunks]}
+    result = BatchFit(knots=np.concatenate(knots) if knots else np.empty(0),
+                      knot_offsets=_offsets(knots),
+                      coefficients=np.concatenate(coefficients) if coefficients else np.empty((0, dim)),
+                      coefficient_offsets=_offsets(coefficients),
+                      degree=np.array([d for chunk in chunks for d in chunk[2]], dtype=np.int64),
+                      errors=[e for chunk in chunks for e in chunk[3]],
+                      timing=timing)
+    timing["total"] = perf_counter() - began
+    return result
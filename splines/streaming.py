@@ -0,0 +1,96 @@
+"""
+Least-squares periodic cubic spline with a fixed number of knots, fitted
+from chunks of samples. Memory depends on the knot count only, so signals
+with millions of samples can be streamed from a generator or a memmap.
+
+    spline = StreamingPeriodicSpline(n_knots=200, period=2 * np.pi)
+    spline.fit(chunked(x, y))
+    ys = spline(xs)
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import spsolve
+
+
+def chunked(x, y, chunk_size=1_000_000):
+    """ Yield (x, y) slices of chunk_size samples, works on memmaps without loading them """
+    for start in range(0, len(y), chunk_size):
+        yield np.asarray(x[start:start + chunk_size]), np.asarray(y[start:start + chunk_size])
+
+
+class StreamingPeriodicSpline:
+    """
+    Uniform periodic cubic B-spline with n_knots coefficients on
+    [x0, x0 + period). partial_fit() adds samples to the normal equations,
+    which are stored as the 4 upper diagonals of the cyclic banded matrix.
+    ridge adds ridge * I (relative to the mean diagonal) so that knot
+    intervals without data still give a solvable system.
+    """
+
+    def __init__(self, n_knots, period, x0=0.0, ridge=1e-10):
+        if n_knots < 4:
+            raise ValueError("a periodic cubic spline needs at least 4 knots")
+        self.n_knots = n_knots
+        self.period = period
+        self.x0 = x0
+        self.ridge = ridge
+        self.n_samples = 0
+        self.coefficients = None
+        self._gram = np.zeros((n_knots, 4))
+        self._rhs = np.zeros(n_knots)
+
+    def _basis(self, x):
+        """ Indices (n, 4) and weights (n, 4) of the basis functions non-zero at x """
+        t = np.mod((np.asarray(x, dtype=float) - self.x0) / self.period, 1.0) * self.n_knots
+        segment = np.minimum(np.floor(t).astype(np.int64), self.n_knots - 1)
+        u = (t - segment)[:, None]
+        weights = np.hstack([(1 - u) ** 3,
+                             3 * u ** 3 - 6 * u ** 2 + 4,
+                             -3 * u ** 3 + 3 * u ** 2 + 3 * u + 1,
+                             u ** 3]) / 6
+        index = (segment[:, None] + np.arange(4)) % self.n_knots
+        return index, weights
+
+    def partial_fit(self, x, y):
+        x = np.ravel(x)
+        y = np.ravel(y)
+        index, weights = self._basis(x)
+        k = self.n_knots
+        for a in range(4):
+            self._rhs += np.bincount(index[:, a], weights[:, a] * y, minlength=k)
+            for d in range(4 - a):
+                self._gram[:, d] += np.bincount(index[:, a], weights[:, a] * weights[:, a + d], minlength=k)
+        self.n_samples += len(y)
+        self.coefficients = None
+        return self
+
+    def fit(self, chunks):
+        """ Accumulate an iterable of (x, y) chunks and solve """
+        for x, y in chunks:
+            self.partial_fit(x, y)
+        return self.solve()
+
+    def solve(self):
+        k = self.n_knots
+        rows, cols, values = [], [], []
+        i = np.arange(k)
+        for d in range(4):
+            j = (i + d) % k
+            rows += [i, j] if d else [i]
+            cols += [j, i] if d else [i]
+            values += [self._gram[:, d]] * (2 if d else 1)
+        # duplicate entries (only for very few knots, where the band wraps onto itself) are summed
+        gram = coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(k, k)).tocsc()
+        scale = max(np.mean(self._gram[:, 0]), np.finfo(float).tiny)
+        gram = gram + coo_matrix((np.full(k, self.ridge * scale), (i, i)), shape=(k, k)).tocsc()
+        self.coefficients = spsolve(gram, self._rhs)
+        return self
+
+    def __call__(self, x):
+        if self.coefficients is None:
+            self.solve()
+        x = np.asarray(x, dtype=float)
+        index, weights = self._basis(x.ravel())
+        return np.sum(weights * self.coefficients[index], axis=1).reshape(x.shape)